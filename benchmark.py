@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the seed prime scripts
+Times the search, the generation closure and the analysis stages at limits
+from 10^3 to 10^7, recording throughput and peak memory in a JSON results
+file. Each case runs in a fresh process so its peak RSS is its own and no
+prime table is carried over from an earlier case. Results are compared with
+a stored baseline and any case that slowed down beyond the tolerance is
+flagged as a regression.
+
+Usage:
+    python3 benchmark.py                      # run and compare with the baseline
+    python3 benchmark.py --update-baseline    # run and store the results as the baseline
+    python3 benchmark.py --max-limit 100000   # quick run
+
+Author: Ian Shannon-Garvey
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+RESULTS_FILE = "benchmark_results.json"
+BASELINE_FILE = "benchmark_baseline.json"
+
+LIMITS = [10**3, 10**4, 10**5, 10**6, 10**7]
+
+# A case counts as a regression if its throughput drops by more than this
+TOLERANCE = 0.20
+
+# Runs shorter than this in the baseline are too noisy to compare
+MIN_COMPARE_SECONDS = 0.1
+
+SEEDS = [2, 3, 5, 7, 11, 23, 83, 167]
+
+def _quiet(func, *args):
+    """Call func with its console output discarded"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+def _is_seed_prime(limit):
+    from verify_seed_primes import is_seed_prime
+    return lambda: [n for n in range(2, limit + 1) if is_seed_prime(n)]
+
+def _find_all_seed_primes(limit):
+    from verify_seed_primes import find_all_seed_primes
+    return lambda: find_all_seed_primes(limit)
+
+def _generation_closure(limit):
+    from generation_engine import generation_closure
+    return lambda: generation_closure(SEEDS, limit)
+
+def _analyze_generation_patterns(limit):
+    from generate_primes_from_seeds import analyze_generation_patterns
+    from generation_engine import GenerationStore
+    store = GenerationStore.build(SEEDS, limit)
+    return lambda: _quiet(analyze_generation_patterns, limit, store)
+
+def _check_extended_seeds(limit):
+    from gap_analysis import check_extended_seeds
+    return lambda: _quiet(check_extended_seeds, limit)
+
+# name: (setup returning the timed callable, largest limit it is run at)
+CASES = {
+    'is_seed_prime': (_is_seed_prime, 10**6),
+    'find_all_seed_primes': (_find_all_seed_primes, 10**7),
+    'generation_closure': (_generation_closure, 10**7),
+    'analyze_generation_patterns': (_analyze_generation_patterns, 10**6),
+    'check_extended_seeds': (_check_extended_seeds, 10**6),
+}
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_case(name, limit):
+    """Time one case in this process; returns its result record"""
+    setup, _ = CASES[name]
+    func = setup(limit)
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {
+        'case': name,
+        'limit': limit,
+        'seconds': elapsed,
+        'throughput': limit / elapsed if elapsed > 0 else float('inf'),
+        'peak_rss': _peak_rss(),
+    }
+
+def run_isolated(name, limit):
+    """Run one case in a fresh interpreter and return its result record"""
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', name,
+                          '--limit', str(limit)],
+                         check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout.splitlines()[-1])
+
+def run_suite(max_limit=LIMITS[-1], cases=None):
+    """Run every case at every limit up to its own and max_limit, printing as it goes"""
+    results = []
+    for name in cases or CASES:
+        for limit in LIMITS:
+            if limit > min(max_limit, CASES[name][1]):
+                break
+            record = run_isolated(name, limit)
+            results.append(record)
+            print(f"  {name:<28} {limit:>12,}  {record['seconds']:9.3f} s  "
+                  f"{record['throughput']:14,.0f} n/s  {record['peak_rss'] / 2**20:8.1f} MiB")
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Return (record, baseline record) for every case that slowed beyond tolerance"""
+    previous = {(r['case'], r['limit']): r for r in baseline}
+    regressions = []
+    for record in results:
+        old = previous.get((record['case'], record['limit']))
+        if (old and old['seconds'] >= MIN_COMPARE_SECONDS
+                and record['throughput'] < old['throughput'] * (1 - tolerance)):
+            regressions.append((record, old))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-limit', type=int, default=LIMITS[-1],
+                        help="largest limit to run any case at")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), help="cases to run")
+    parser.add_argument('--output', default=RESULTS_FILE, help="results file")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline file")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="store these results as the new baseline")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--limit', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Child process: run one case and report it on the last line
+        print(json.dumps(run_case(args.case, args.limit)))
+        return 0
+
+    print("Seed Prime Benchmarks")
+    print("=" * 60)
+    results = run_suite(args.max_limit, args.cases)
+    with open(args.output, 'w') as f:
+        json.dump({'time': time.time(), 'python': sys.version.split()[0],
+                   'results': results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'time': time.time(), 'python': sys.version.split()[0],
+                       'results': results}, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} (run with --update-baseline to store one)")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f)['results'])
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {TOLERANCE:.0%})")
+        return 0
+    print(f"\n⚠ {len(regressions)} regression(s) against {args.baseline}:")
+    for record, old in regressions:
+        print(f"  {record['case']} at {record['limit']:,}: "
+              f"{record['throughput']:,.0f} n/s, was {old['throughput']:,.0f} n/s "
+              f"({record['throughput'] / old['throughput'] - 1:+.0%})")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Crash-safe checkpoint journal for long seed prime searches
+Append-only binary file of completed segments. Each record carries its own
+range, seeds and CRC and is fsync'ed on commit; a torn record left by a crash
+is dropped on load. The file is created and repaired via temporary copy and
+atomic rename. Records name their own ranges, so the journal is not tied to
+a search limit and out-of-order segments are recovered exactly.
+
+Author: Ian Shannon-Garvey
+"""
+
+import os
+import struct
+import time
+import zlib
+
+MAGIC = b'SEEDJRNL'
+VERSION = 1
+
+# magic, version
+_HEADER = struct.Struct('<8sH6x')
+# lo, hi, commit time, number of seeds (followed by the seeds and a CRC32)
+_RECORD = struct.Struct('<QQdI')
+_SEED = struct.Struct('<Q')
+_CRC = struct.Struct('<I')
+
+def _fsync_directory(path):
+    """Make a rename in path's directory durable"""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _atomic_write(path, data):
+    """Replace path with data via fsync'ed temporary file and rename"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_directory(path)
+
+def _encode(lo, hi, seeds, stamp):
+    """One journal record, CRC included"""
+    body = _RECORD.pack(lo, hi, stamp, len(seeds)) + b''.join(_SEED.pack(p) for p in seeds)
+    return body + _CRC.pack(zlib.crc32(body))
+
+def merge_intervals(intervals):
+    """Merge half-open (lo, hi) intervals into a sorted list of disjoint ones"""
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+def subtract_intervals(lo, hi, covered):
+    """Parts of [lo, hi) not covered by the sorted disjoint intervals in covered"""
+    gaps = []
+    for c_lo, c_hi in covered:
+        if c_hi <= lo:
+            continue
+        if c_lo >= hi:
+            break
+        if c_lo > lo:
+            gaps.append((lo, c_lo))
+        lo = max(lo, c_hi)
+    if lo < hi:
+        gaps.append((lo, hi))
+    return gaps
+
+class CheckpointJournal:
+    """Append-only record of completed search segments"""
+
+    def __init__(self, path):
+        self.path = path
+        self.segments = []
+        if os.path.exists(path):
+            self._load()
+        else:
+            _atomic_write(path, _HEADER.pack(MAGIC, VERSION))
+        self.file = open(path, 'ab')
+
+    def _load(self):
+        """Read every intact record; drop a torn tail left by a crash"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size or _HEADER.unpack_from(data)[0] != MAGIC:
+            raise ValueError(f"{self.path} is not a seed prime journal")
+        version = _HEADER.unpack_from(data)[1]
+        if version != VERSION:
+            raise ValueError(f"{self.path} has journal version {version}, expected {VERSION}")
+        offset = _HEADER.size
+        while offset + _RECORD.size <= len(data):
+            lo, hi, stamp, count = _RECORD.unpack_from(data, offset)
+            end = offset + _RECORD.size + count * _SEED.size
+            if end + _CRC.size > len(data):
+                break
+            if _CRC.unpack_from(data, end)[0] != zlib.crc32(data[offset:end]):
+                break
+            seeds = [_SEED.unpack_from(data, pos)[0]
+                     for pos in range(offset + _RECORD.size, end, _SEED.size)]
+            self.segments.append((lo, hi, seeds))
+            offset = end + _CRC.size
+        if offset < len(data):
+            print(f"Journal {self.path}: dropping {len(data) - offset} bytes of incomplete record")
+            _atomic_write(self.path, data[:offset])
+
+    def commit(self, lo, hi, seeds):
+        """Durably record that [lo, hi) is searched and holds exactly these seeds"""
+        self.file.write(_encode(lo, hi, seeds, time.time()))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.segments.append((lo, hi, list(seeds)))
+
+    def completed(self):
+        """Sorted disjoint intervals covered by committed segments"""
+        return merge_intervals((lo, hi) for lo, hi, _ in self.segments)
+
+    def pending(self, lo, hi):
+        """Sub-ranges of [lo, hi) not yet covered by the journal"""
+        return subtract_intervals(lo, hi, self.completed())
+
+    def seeds(self, lo, hi):
+        """Sorted seeds recorded in [lo, hi)"""
+        return sorted({p for _, _, seeds in self.segments for p in seeds if lo <= p < hi})
+
+    def close(self):
+        self.file.close()
+
+    def remove(self):
+        """Close and delete the journal"""
+        self.close()
+        os.remove(self.path)
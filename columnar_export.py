@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Columnar, memory-mappable export of per-prime results
+One row per prime up to a limit, stored as fixed-width little-endian
+columns: the prime, its representation count r(p), its smallest witness a,
+its generation and the parent pair that first produced it. Rows are written
+a chunk (a range of values) at a time as the chunk is computed, each column
+contiguous and 8-byte aligned; the chunk index goes at the end and the header
+is filled in last, so a file is only readable once it is complete.
+
+Layout:
+    header   magic, version, k, column count, limit, chunk count, index offset
+    columns  name and dtype of each column (struct/NumPy codes such as '<Q')
+    chunks   for each chunk, every column's values in turn
+    index    lo, hi, rows and the offset of every column, per chunk
+
+With NumPy, a column of one chunk maps without copying:
+    numpy.memmap(path, numpy.dtype(dtype), 'r', offset, (rows,))
+using the offsets from ColumnarExport.chunks; ColumnarExport.column gives
+the same data as a memoryview without NumPy.
+
+Usage:
+    python3 columnar_export.py results.cols 1000000 [--fields witness generation]
+    python3 columnar_export.py results.cols --show
+
+Author: Ian Shannon-Garvey
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+from checkpoint_journal import _fsync_directory
+from generation_engine import UNGENERATED, GenerationStore
+from prime_sieve import primes_in
+from seed_search import minimal_witnesses, representation_counts, seed_primes_in
+
+MAGIC = b'SEEDCOLS'
+VERSION = 1
+
+# magic, version, k, column count, limit, chunk count, index offset (0 until complete)
+_HEADER = struct.Struct('<8sHHHxxQQQ')
+
+# column name and dtype
+_COLUMN = struct.Struct('<24s8s')
+
+# Values per chunk; the representation counts of a chunk cost about as much
+# as counting a block of its width near the limit, so wider chunks are cheaper
+CHUNK_SIZE = 1 << 20
+
+# Every column that can be exported and its dtype; 'prime' is always included.
+# witness is 0 for seeds, generation is 255 for primes never generated and
+# the parents are 0 for seeds and ungenerated primes.
+COLUMNS = {
+    'prime': '<Q',
+    'representations': '<I',
+    'witness': '<I',
+    'generation': '<B',
+    'parent_p': '<Q',
+    'parent_q': '<Q',
+}
+
+def _pad(f):
+    """Pad the open file with zeros to the next multiple of 8 bytes"""
+    f.write(bytes(-f.tell() % 8))
+
+class ColumnarWriter:
+    """Streams chunks of rows to a new export file, which appears on close
+
+    Chunks are written to path + '.tmp'; close writes the index, fills in the
+    header, fsyncs and renames, so an interrupted export leaves no file that
+    looks complete.
+    """
+
+    def __init__(self, path, columns, limit, k=2):
+        self.path = path
+        self.columns = ['prime'] + [c for c in columns if c != 'prime']
+        for name in self.columns:
+            if name not in COLUMNS:
+                raise ValueError(f"unknown column {name!r}; expected one of {list(COLUMNS)}")
+        self.limit = limit
+        self.k = k
+        self.index = []
+        self.file = open(f"{path}.tmp", 'wb')
+        self.file.write(_HEADER.pack(MAGIC, VERSION, k, len(self.columns), limit, 0, 0))
+        for name in self.columns:
+            self.file.write(_COLUMN.pack(name.encode(), COLUMNS[name].encode()))
+
+    def append(self, lo, hi, values):
+        """Write the rows of the primes in [lo, hi); values maps each column to an array"""
+        rows = len(values['prime'])
+        offsets = []
+        for name in self.columns:
+            column = values[name]
+            if len(column) != rows:
+                raise ValueError(f"column {name!r} has {len(column)} rows, expected {rows}")
+            column = array(COLUMNS[name][1], column)
+            if sys.byteorder != 'little':
+                column.byteswap()
+            _pad(self.file)
+            offsets.append(self.file.tell())
+            self.file.write(column.tobytes())
+        self.index.append((lo, hi, rows, offsets))
+
+    def close(self):
+        """Write the index and header and move the finished file into place"""
+        f = self.file
+        _pad(f)
+        index_offset = f.tell()
+        entry = struct.Struct(f'<QQQ{len(self.columns)}Q')
+        for lo, hi, rows, offsets in self.index:
+            f.write(entry.pack(lo, hi, rows, *offsets))
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, self.k, len(self.columns), self.limit,
+                             len(self.index), index_offset))
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(f"{self.path}.tmp", self.path)
+        _fsync_directory(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(f"{self.path}.tmp")
+
+class ColumnarExport:
+    """Read-only memory map of a finished export file
+
+    chunks is a list of (lo, hi, rows, {column: offset}); column(name, i)
+    returns chunk i's values as a memoryview over the map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < _HEADER.size or self.map[:8] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar export")
+        _, version, self.k, count, self.limit, chunks, index_offset = _HEADER.unpack_from(self.map)
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path} has export version {version}, expected {VERSION}")
+        if not index_offset:
+            self.close()
+            raise ValueError(f"{path} is incomplete")
+        self.columns = {}
+        for i in range(count):
+            name, dtype = _COLUMN.unpack_from(self.map, _HEADER.size + i * _COLUMN.size)
+            self.columns[name.rstrip(b'\0').decode()] = dtype.rstrip(b'\0').decode()
+        entry = struct.Struct(f'<QQQ{count}Q')
+        self.chunks = []
+        for i in range(chunks):
+            lo, hi, rows, *offsets = entry.unpack_from(self.map, index_offset + i * entry.size)
+            self.chunks.append((lo, hi, rows, dict(zip(self.columns, offsets))))
+
+    def __len__(self):
+        return sum(rows for _, _, rows, _ in self.chunks)
+
+    def column(self, name, chunk):
+        """Values of column name in chunk number chunk, as a memoryview (little-endian hosts)"""
+        lo, hi, rows, offsets = self.chunks[chunk]
+        dtype = self.columns[name]
+        start = offsets[name]
+        size = struct.calcsize(dtype)
+        return memoryview(self.map)[start:start + rows * size].cast(dtype[1])
+
+    def chunk_of(self, n):
+        """Number of the chunk whose value range holds n"""
+        i = bisect_left([hi for _, hi, _, _ in self.chunks], n + 1)
+        if i == len(self.chunks) or not self.chunks[i][0] <= n:
+            raise ValueError(f"{n} is outside the exported range")
+        return i
+
+    def row(self, p):
+        """{column: value} for prime p (ValueError if p is not an exported prime)"""
+        i = self.chunk_of(p)
+        primes = self.column('prime', i)
+        j = bisect_left(primes, p)
+        if j == len(primes) or primes[j] != p:
+            raise ValueError(f"{p} is not an exported prime")
+        return {name: self.column(name, i)[j] for name in self.columns}
+
+    def close(self):
+        self.map.close()
+
+def export_results(path, limit, columns=tuple(COLUMNS), k=2, chunk_size=CHUNK_SIZE,
+                   verbose=True):
+    """Compute the requested columns for every prime up to limit and export them to path
+
+    Generation and parents need the whole closure up to limit, which is run
+    first (after the seed search); the other columns are computed chunk by
+    chunk as the chunks are written.
+    """
+    store = None
+    if 'generation' in columns or 'parent_p' in columns or 'parent_q' in columns:
+        store = GenerationStore.build(seed_primes_in(2, limit + 1, k), limit, k)
+    with ColumnarWriter(path, columns, limit, k) as writer:
+        for lo in range(0, limit + 1, chunk_size):
+            hi = min(lo + chunk_size, limit + 1)
+            start = time.perf_counter()
+            if store:
+                first, last = bisect_left(store.primes, lo), bisect_left(store.primes, hi)
+                primes = store.primes[first:last]
+            else:
+                primes = array('Q', primes_in(lo, hi))
+            values = {'prime': primes}
+            if 'representations' in writer.columns:
+                counts = representation_counts(lo, hi, k)
+                values['representations'] = [counts[p - lo] for p in primes]
+            if 'witness' in writer.columns:
+                minimal = minimal_witnesses(max(lo, 2), hi, k)
+                values['witness'] = [minimal.get(p, 0) for p in primes]
+            if store:
+                values['generation'] = store.depth[first:last]
+                values['parent_p'] = [store.primes[i] if i >= 0 else 0
+                                      for i in store.parent_p[first:last]]
+                values['parent_q'] = [store.primes[i] if i >= 0 else 0
+                                      for i in store.parent_q[first:last]]
+            writer.append(lo, hi, values)
+            if verbose:
+                print(f"  [{lo:,}, {hi:,}): {len(primes):,} primes "
+                      f"in {time.perf_counter() - start:.1f} s")
+
+def show(path):
+    """Print the layout and a few rows of an export file"""
+    export = ColumnarExport(path)
+    try:
+        print(f"{path}: {len(export):,} primes up to {export.limit:,} (k = {export.k}), "
+              f"{len(export.chunks)} chunks")
+        for name, dtype in export.columns.items():
+            print(f"  {name:<16} {dtype}")
+        if export.chunks:
+            for p in export.column('prime', 0)[:12].tolist():
+                row = export.row(p)
+                if row.get('generation') == UNGENERATED:
+                    row['generation'] = None
+                print(f"  {row}")
+    finally:
+        export.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('limit', type=int, nargs='?')
+    parser.add_argument('--fields', nargs='+', default=list(COLUMNS), choices=list(COLUMNS),
+                        help="columns to export (default: all)")
+    parser.add_argument('--k', type=int, default=2, help="coefficient of b (default 2)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--show', action='store_true', help="describe an existing export")
+    args = parser.parse_args()
+
+    if args.show:
+        show(args.path)
+        return 0
+    if args.limit is None:
+        parser.error("limit is required unless --show is given")
+    print(f"Exporting {args.fields} up to {args.limit:,} to {args.path}")
+    start = time.perf_counter()
+    export_results(args.path, args.limit, args.fields, args.k, args.chunk_size)
+    print(f"Done in {time.perf_counter() - start:.1f} s ({os.path.getsize(args.path):,} bytes)")
+    show(args.path)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
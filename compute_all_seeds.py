@@ -9,129 +9,194 @@ Date: July 2025
 
 # ADJUST THIS VALUE TO SET YOUR SEARCH LIMIT
 SEARCH_LIMIT = 10000  # Default: search up to 10,000
+WORKERS = 1           # Worker processes (set to your core count for big runs)
+PRIME_CACHE = "seed_primes_cache.bin"  # On-disk prime bitmap reused across runs (None to disable)
 
 import json
-import time
 import os
-from datetime import datetime
+import time
 
-# Standard implementation
-def is_prime(n):
-    """Check if n is prime"""
-    if n < 2:
-        return False
-    if n == 2:
-        return True
-    if n % 2 == 0:
-        return False
-    for i in range(3, int(n**0.5) + 1, 2):
-        if n % i == 0:
-            return False
-    return True
+from checkpoint_journal import CheckpointJournal, merge_intervals, subtract_intervals
+from generation_engine import UNGENERATED, generation_closure
+from metrics import METRICS, MetricsExporter
+from prime_sieve import is_prime, primes_in
+from parallel_search import ParallelSearch
+from prime_cache import use_cache
+from seed_search import SegmentSummary, merge_records, search_with_summaries
+from segment_scheduler import AdaptiveScheduler
+from verified_ledger import LEDGER_FILE, VerifiedLedger
 
-def is_seed_prime(n):
-    """Check if prime n cannot be written as a + 2*b with a < b both prime"""
+JOURNAL_FILE = "seed_primes_journal.bin"
+METRICS_FILE = "seed_primes_metrics.jsonl"
+PROMETHEUS_FILE = "seed_primes.prom"   # Point at the node exporter's textfile directory
+METRICS_INTERVAL = 10.0               # Seconds between metric exports
+WITNESS_FILE = "seed_primes_witnesses.jsonl"  # Per-segment minimal witness summaries
+CHECKPOINT_SECONDS = 60.0             # Blocks are sized to take about this long
+
+def is_seed_prime(n, k=2):
+    """Check if prime n cannot be written as a + k*b with a < b both prime (k = 2: A385077)"""
     if not is_prime(n):
         return False
     
-    for a in range(2, n//3 + 1):
-        if is_prime(a):
-            remainder = n - a
-            if remainder % 2 == 0:
-                b = remainder // 2
-                if b > a and is_prime(b):
-                    return False
+    for a in primes_in(2, n//(k + 1) + 1):
+        remainder = n - a
+        if remainder % k == 0:
+            b = remainder // k
+            if b > a and is_prime(b):
+                return False
     return True
 
-def compute_with_checkpointing(limit, checkpoint_interval=1000000):
-    """Compute seed primes with checkpointing for recovery"""
-    checkpoint_file = f"seed_primes_checkpoint_{limit}.json"
-    
-    # Try to load checkpoint
-    start_from = 2
-    seeds_found = []
-    
-    if os.path.exists(checkpoint_file):
-        print(f"Loading checkpoint from {checkpoint_file}")
-        with open(checkpoint_file, 'r') as f:
-            data = json.load(f)
-            start_from = data['last_checked'] + 1
-            seeds_found = data['seeds_found']
-            print(f"Resuming from {start_from:,}")
-    
-    # Continue computation
-    last_checkpoint = start_from
+def _read_summaries(path):
+    """Segment summaries saved by _append_summaries (a torn last line is skipped)"""
+    summaries = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                record['records'] = [tuple(r) for r in record['records']]
+                summaries.append(SegmentSummary(**record))
+    return summaries
+
+def _append_summaries(path, summaries):
+    """Append segment summaries to path, one JSON object per line"""
+    with open(path, 'a') as f:
+        for summary in summaries:
+            f.write(json.dumps(summary._asdict()) + '\n')
+
+def compute_with_checkpointing(limit, checkpoint_interval=None, workers=1,
+                               journal_file=JOURNAL_FILE, metrics_file=METRICS_FILE,
+                               prometheus_file=PROMETHEUS_FILE, witness_file=WITNESS_FILE,
+                               ledger_file=LEDGER_FILE):
+    """Compute seed primes with checkpointing for recovery
+
+    Each block is searched by seed_search and checkpointed; blocks are sized
+    from the measured throughput to take about CHECKPOINT_SECONDS, unless a
+    fixed checkpoint_interval is given. With workers > 1 each block is
+    handed out to a process pool in smaller units (see parallel_search).
+    Completed blocks go to an append-only journal, so an interrupted run
+    resumes where it stopped even if it is restarted with a larger limit.
+    Metrics are exported every METRICS_INTERVAL seconds (see metrics.py) and
+    the ETA comes from the same throughput fit, since the cost grows with n.
+    Each segment's minimal witness summary is appended to witness_file, and
+    primes whose minimal witness a sets a new record are reported.
+    Every block is also entered in the permanent ledger; ranges an earlier
+    run verified are skipped, so raising the limit only searches the rest.
+    """
+    journal = CheckpointJournal(journal_file)
+    ledger = VerifiedLedger(ledger_file)
+    exporter = MetricsExporter(metrics_file, prometheus_file, METRICS_INTERVAL)
+    
+    # Work out what is left from the ledger and the journal
+    pending = subtract_intervals(2, limit + 1, merge_intervals(
+        ledger.covered() + journal.completed()))
+    todo = sum(hi - lo for lo, hi in pending)
+    if checkpoint_interval:
+        blocks = AdaptiveScheduler(pending, 0, segment=checkpoint_interval)
+    else:
+        blocks = AdaptiveScheduler(pending, CHECKPOINT_SECONDS)
+    seeds_found = sorted(set(journal.seeds(2, limit + 1)) | set(ledger.seeds(2, limit + 1)))
+    if ledger.entries:
+        verified = sum(min(hi, limit + 1) - lo for lo, hi in ledger.covered() if lo < limit + 1)
+        print(f"Ledger {ledger_file}: {verified:,} numbers already verified")
+    if journal.segments:
+        print(f"Loaded {len(journal.segments)} completed segments from {journal_file}")
+        print(f"Remaining: {todo:,} of {limit - 1:,} numbers")
+    elif os.path.exists(witness_file) and not ledger.entries:
+        # A fresh run with nothing verified: stale summaries start over
+        os.remove(witness_file)
+    records = merge_records(_read_summaries(witness_file))
+    
+    # Continue computation, one block per checkpoint interval
     start_time = time.time()
+    done = 0
+    gauges = {}
+    with METRICS.stage('pool_start'):
+        pool = ParallelSearch(limit, workers) if workers > 1 else None
+    
+    def search(lo, hi):
+        if pool:
+            return pool.search(lo, hi), pool.summaries
+        return search_with_summaries(lo, hi)
     
     try:
-        for n in range(start_from, limit + 1):
-            if is_seed_prime(n):
-                seeds_found.append(n)
-                print(f"Found seed prime: {n}")
+        for lo, hi in blocks:
+            n = hi - 1
+            block_start = time.perf_counter()
+            with METRICS.stage('search'):
+                seeds, summaries = search(lo, hi)
+            blocks.record(lo, hi, time.perf_counter() - block_start)
+            for p in seeds:
+                seeds_found.append(p)
+                print(f"Found seed prime: {p}")
+            
+            # Checkpoint after every block (summaries first: a rerun may repeat them
+            # harmlessly; the ledger before the journal, so a block the journal calls
+            # done is always in the ledger, which outlives the journal)
+            with METRICS.stage('journal'):
+                _append_summaries(witness_file, summaries)
+                ledger.record(lo, hi, seeds, summaries)
+                journal.commit(lo, hi, seeds)
+            count = len(records)
+            records = merge_records(summaries, records)
+            for p, a in records[count:]:
+                print(f"New minimal witness record: {p} needs a = {a}")
+            done += hi - lo
+            
+            elapsed = time.time() - start_time
+            rate = done / elapsed
+            remaining = blocks.curve.seconds(blocks.remaining())
+            
+            gauges = {'numbers_done': done, 'numbers_total': todo,
+                      'segments_per_second': METRICS.counters.get('segments', 0) / elapsed,
+                      'seeds_found': len(seeds_found)}
+            # No ETA until the cost curve has kept a block
+            if remaining is not None:
+                gauges['eta_seconds'] = remaining
+            exporter.write(gauges)
             
-            # Checkpoint periodically
-            if n - last_checkpoint >= checkpoint_interval or n == limit:
-                with open(checkpoint_file, 'w') as f:
-                    json.dump({
-                        'last_checked': n,
-                        'seeds_found': seeds_found,
-                        'timestamp': datetime.now().isoformat()
-                    }, f)
-                
-                elapsed = time.time() - start_time
-                rate = (n - start_from + 1) / elapsed
-                remaining = (limit - n) / rate if rate > 0 else 0
-                
-                print(f"Checkpoint at {n:,} ({n/limit*100:.1f}%)")
-                print(f"  Seeds found: {len(seeds_found)}")
-                print(f"  Rate: {rate:.0f} numbers/second")
+            print(f"Checkpoint at {n:,} ({n/limit*100:.1f}%)")
+            print(f"  Seeds found: {len(seeds_found)}")
+            print(f"  Rate: {rate:.0f} numbers/second")
+            if remaining is not None:
                 print(f"  ETA: {remaining/60:.1f} minutes")
-                
-                last_checkpoint = n
     
     except KeyboardInterrupt:
         print("\nInterrupted. Progress saved to checkpoint.")
-        return seeds_found
+        journal.close()
+        return sorted(seeds_found)
+    finally:
+        exporter.write(gauges, force=True)
+        if pool:
+            pool.close()
     
-    # Clean up checkpoint file on completion
-    if os.path.exists(checkpoint_file):
-        os.remove(checkpoint_file)
+    # Clean up journal on completion (the ledger keeps the verified ranges)
+    journal.remove()
     
-    return seeds_found
+    return sorted(seeds_found)
 
 def verify_generation_claim(seeds, limit):
     """Verify that seeds generate all primes up to limit"""
     print(f"\nVerifying that {len(seeds)} seeds generate all primes up to {limit}")
     
-    generated = set(seeds)
-    generation = 0
-    
-    while True:
-        new_found = False
-        generation += 1
-        current = sorted(list(generated))
-        
-        for p in current:
-            for q in current:
-                if p < q:
-                    r = p + 2 * q
-                    if r <= limit and r not in generated and is_prime(r):
-                        generated.add(r)
-                        new_found = True
-        
-        if not new_found:
-            break
-        
-        print(f"Generation {generation}: {len(generated)} primes total")
+    depth, rounds = generation_closure(seeds, limit)
+    
+    total = len(rounds[0])
+    for generation, new in enumerate(rounds[1:], 1):
+        total += len(new)
+        print(f"Generation {generation}: {total} primes total")
     
     # Check coverage
-    actual_primes = [n for n in range(2, limit + 1) if is_prime(n)]
-    coverage = len(generated & set(actual_primes)) / len(actual_primes) * 100
+    actual_primes = list(primes_in(2, limit + 1))
+    not_generated = [p for p in actual_primes if depth[p] == UNGENERATED]
+    coverage = (len(actual_primes) - len(not_generated)) / len(actual_primes) * 100
     
-    print(f"\nCoverage: {coverage:.1f}% ({len(generated)}/{len(actual_primes)} primes)")
+    print(f"\nCoverage: {coverage:.1f}% ({total}/{len(actual_primes)} primes)")
     
     if coverage < 100:
-        missed = sorted(set(actual_primes) - generated)[:10]
+        missed = not_generated[:10]
         print(f"Missed primes: {missed}...")
     
     return coverage == 100
@@ -141,6 +206,11 @@ def main():
     print("=" * 60)
     print(f"Search limit: {SEARCH_LIMIT:,}")
     
+    # Map the prime table from disk, sieving only what earlier runs did not cover
+    if PRIME_CACHE:
+        cache = use_cache(PRIME_CACHE, SEARCH_LIMIT)
+        print(f"Prime cache: {PRIME_CACHE} (covers up to {cache.limit:,})")
+    
     # Quick test to verify implementation
     print("\nQuick verification up to 1000...")
     seeds_1k = [n for n in range(2, 1001) if is_seed_prime(n)]
@@ -157,16 +227,9 @@ def main():
     print("Press Ctrl+C at any time to pause (progress will be saved)")
     print("-" * 60)
     
-    # Determine checkpoint interval based on limit
-    if SEARCH_LIMIT <= 1000000:
-        checkpoint_interval = 100000
-    elif SEARCH_LIMIT <= 10000000:
-        checkpoint_interval = 1000000
-    else:
-        checkpoint_interval = 5000000
-    
+    # Checkpoint blocks and segments are sized by segment_scheduler
     start_time = time.time()
-    seeds = compute_with_checkpointing(SEARCH_LIMIT, checkpoint_interval)
+    seeds = compute_with_checkpointing(SEARCH_LIMIT, workers=WORKERS)
     total_time = time.time() - start_time
     
     print("\n" + "=" * 60)
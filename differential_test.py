@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Differential tests of the fast engines against the reference implementations
+The batched search, witness pre-filter, bitset closure, parent queries,
+parallel closure, prime cache and Miller-Rabin are each compared with the
+plain definitions: trial division, the reference is_seed_prime and the
+pair-by-pair generation loop. Small ranges are checked densely for several
+coefficients k; the rest of the time budget goes to random windows and
+points up to 10^7, so a run takes a few seconds whatever the machine.
+
+Usage:
+    python3 differential_test.py [--budget SECONDS] [--seed N]
+
+Author: Ian Shannon-Garvey
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from generation_engine import SEEDS, UNGENERATED, FanoutIndex, GenerationStore, generation_closure
+from multi_coefficient import seed_sets
+from parallel_generation import parallel_generation_closure
+from prime_cache import PrimeCache, build_cache
+from prime_sieve import is_prime, miller_rabin, primes_in, segment_flags
+from seed_search import (first_witness, minimal_witnesses, representation_counts, segment_search,
+                         seed_primes_in)
+from verify_seed_primes import is_seed_prime
+
+# Seconds for a whole run; random sampling stops when it is used up
+TIME_BUDGET = 3.0
+
+# Dense checks: every n up to these limits, for each coefficient k
+DENSE_LIMIT = 3000
+CLOSURE_LIMIT = 1500
+COEFFICIENTS = range(1, 7)
+
+# Searches are also started this far below zero, where nothing must shift
+NEGATIVE_START = 5
+
+# Random sampling: windows of WINDOW numbers and single points below SAMPLE_LIMIT
+SAMPLE_LIMIT = 10**7
+WINDOW = 1000
+SAMPLE_COEFFICIENTS = (2, 2, 2, 4, 6, 10)
+
+def trial_prime(n):
+    """Primality by trial division"""
+    if n < 2:
+        return False
+    d = 2
+    while d * d <= n:
+        if n % d == 0:
+            return False
+        d += 1
+    return True
+
+def reference_witness(n, k=2):
+    """Smallest prime a with n = a + kb for a prime b > a, trying every a"""
+    for a in range(2, n // (k + 1) + 1):
+        b, rem = divmod(n - a, k)
+        if not rem and b > a and is_prime(a) and is_prime(b):
+            return a
+    return None
+
+def reference_counts(limit, k=2):
+    """r[n] = #{a < b prime : a + kb = n} for 0 <= n < limit, pair by pair"""
+    primes = list(primes_in(2, limit))
+    counts = [0] * limit
+    for i, b in enumerate(primes):
+        for a in primes[:i]:
+            if a + k * b >= limit:
+                break
+            counts[a + k * b] += 1
+    return counts
+
+def reference_closure(seeds, limit, k=2):
+    """({r: generation}, {r: (p, q)}) from the plain pair-by-pair generation loop
+
+    Each generation tries every pair p < q of primes generated so far, in
+    increasing p and then q, and keeps the first pair that produces r.
+    """
+    generation = {s: 0 for s in seeds if s <= limit}
+    parents = {}
+    g = 0
+    while True:
+        g += 1
+        known = sorted(generation)
+        new = {}
+        for i, p in enumerate(known):
+            for q in known[i + 1:]:
+                r = p + k * q
+                if r > limit:
+                    break
+                if r not in generation and r not in new and is_prime(r):
+                    new[r] = (p, q)
+        if not new:
+            return generation, parents
+        for r, pair in new.items():
+            generation[r] = g
+            parents[r] = pair
+
+class Checker:
+    """Runs named comparisons and collects the mismatches"""
+
+    def __init__(self):
+        self.checks = {}
+        self.failures = []
+
+    def expect(self, name, got, expected, context):
+        """Record one comparison; a mismatch is reported with its context"""
+        self.checks[name] = self.checks.get(name, 0) + 1
+        if got != expected:
+            self.failures.append(f"{name} {context}: got {got!r}, expected {expected!r}")
+
+def check_primes(checker):
+    """Sieve, Miller-Rabin and the prime cache against trial division"""
+    expected = [n for n in range(DENSE_LIMIT + 1) if trial_prime(n)]
+    checker.expect('sieve', list(primes_in(0, DENSE_LIMIT + 1)), expected, f"up to {DENSE_LIMIT}")
+    checker.expect('miller_rabin', [n for n in range(DENSE_LIMIT + 1) if miller_rabin(n)],
+                   expected, f"up to {DENSE_LIMIT}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.bin')
+        build_cache(path, DENSE_LIMIT // 2)
+        build_cache(path, DENSE_LIMIT)  # extended in place
+        cache = PrimeCache(path)
+        try:
+            checker.expect('prime_cache', cache.segment_flags(0, DENSE_LIMIT + 1),
+                           segment_flags(0, DENSE_LIMIT + 1), f"up to {DENSE_LIMIT}")
+            checker.expect('prime_cache', [n for n in expected if not cache.is_prime(n)], [],
+                           "is_prime")
+        finally:
+            cache.close()
+
+def check_dense(checker):
+    """Seed sets, representation counts and minimal witnesses for every n and k"""
+    primes = list(primes_in(2, DENSE_LIMIT + 1))
+    sets = seed_sets(2, DENSE_LIMIT + 1, COEFFICIENTS)
+    low_sets = [seed_sets(lo, 200, COEFFICIENTS) for lo in (0, 1)]
+    for k in COEFFICIENTS:
+        expected = [p for p in primes if is_seed_prime(p, k)]
+        checker.expect('seed_primes_in', seed_primes_in(2, DENSE_LIMIT + 1, k), expected, f"k={k}")
+        checker.expect('seed_primes_in', seed_primes_in(-NEGATIVE_START, 200, k),
+                       [p for p in expected if p < 200], f"k={k} from {-NEGATIVE_START}")
+        checker.expect('seed_sets', sets[k], expected, f"k={k}")
+        for lo, low in zip((0, 1), low_sets):
+            checker.expect('seed_sets', low[k], [p for p in expected if p < 200], f"k={k} from {lo}")
+        checker.expect('representation_counts', list(representation_counts(0, DENSE_LIMIT, k)),
+                       reference_counts(DENSE_LIMIT, k), f"k={k}")
+        witnesses = [first_witness(p, k=k) for p in primes]
+        checker.expect('first_witness', witnesses, [reference_witness(p, k) for p in primes],
+                       f"k={k}")
+        checker.expect('minimal_witnesses', minimal_witnesses(-NEGATIVE_START, 200, k),
+                       {p: a for p, a in zip(primes, witnesses) if p < 200 and a is not None},
+                       f"k={k} from {-NEGATIVE_START}")
+
+def check_closure(checker):
+    """Bitset, parallel and stored closures against the pair-by-pair loop"""
+    primes = list(primes_in(2, CLOSURE_LIMIT + 1))
+    for k in COEFFICIENTS:
+        seeds = seed_primes_in(2, CLOSURE_LIMIT + 1, k)
+        generation, parents = reference_closure(seeds, CLOSURE_LIMIT, k)
+        expected = [generation.get(p, UNGENERATED) for p in primes]
+        depth, rounds = generation_closure(seeds, CLOSURE_LIMIT, k)
+        checker.expect('generation_closure', [depth[p] for p in primes], expected, f"k={k}")
+        store = GenerationStore.from_closure(depth, rounds, CLOSURE_LIMIT, k)
+        checker.expect('GenerationStore.parents', {p: store.parents(p) for p in primes
+                                                   if store.parents(p)}, parents, f"k={k}")
+        fanout = FanoutIndex(store)
+        checker.expect('FanoutIndex.children',
+                       [(fanout.children(p, 'p'), fanout.children(p, 'q')) for p in primes],
+                       [([r for r, pair in sorted(parents.items()) if pair[0] == p],
+                         [r for r, pair in sorted(parents.items()) if pair[1] == p]) for p in primes],
+                       f"k={k}")
+        degree_p, degree_q = dict.fromkeys(primes, 0), dict.fromkeys(primes, 0)
+        generated = sorted(generation)
+        for i, p in enumerate(generated):
+            for q in generated[i + 1:]:
+                if p + k * q > CLOSURE_LIMIT:
+                    break
+                if p + k * q in generation:
+                    degree_p[p] += 1
+                    degree_q[q] += 1
+        checker.expect('FanoutIndex.fanout',
+                       [(fanout.fanout(p, 'p'), fanout.fanout(p, 'q')) for p in primes],
+                       [(degree_p[p], degree_q[p]) for p in primes], f"k={k}")
+    depth, rounds = generation_closure(SEEDS, CLOSURE_LIMIT)
+    checker.expect('parallel_generation_closure',
+                   parallel_generation_closure(SEEDS, CLOSURE_LIMIT, workers=2),
+                   (depth, rounds), f"k=2 up to {CLOSURE_LIMIT}")
+
+def check_window(checker, lo, k):
+    """segment_search and minimal_witnesses on [lo, lo + WINDOW) against the reference"""
+    hi = lo + WINDOW
+    seeds, summary = segment_search(lo, hi, k)
+    primes = list(primes_in(lo, hi))
+    expected = []
+    minimal = {}
+    records = []
+    best = 0
+    for p in primes:
+        a = reference_witness(p, k)
+        if a is None:
+            expected.append(p)
+            continue
+        minimal[p] = a
+        if a > best:
+            records.append((p, a))
+            best = a
+    context = f"[{lo}, {hi}) k={k}"
+    checker.expect('segment_search seeds', seeds, expected, context)
+    checker.expect('segment_search summary', (summary.primes, summary.max_witness, summary.records),
+                   (len(primes), best, records), context)
+    checker.expect('minimal_witnesses', minimal_witnesses(lo, hi, k), minimal, context)
+
+def check_point(checker, n):
+    """is_prime and miller_rabin against trial division at one n"""
+    expected = trial_prime(n)
+    checker.expect('is_prime', is_prime(n), expected, f"n={n}")
+    checker.expect('miller_rabin', miller_rabin(n), expected, f"n={n}")
+
+def run(budget=TIME_BUDGET, seed=0):
+    """Run every check within about budget seconds; returns (checker, samples)"""
+    deadline = time.perf_counter() + budget
+    checker = Checker()
+    check_primes(checker)
+    check_dense(checker)
+    check_closure(checker)
+    rng = random.Random(seed)
+    samples = 0
+    while time.perf_counter() < deadline:
+        k = rng.choice(SAMPLE_COEFFICIENTS)
+        check_window(checker, rng.randrange(DENSE_LIMIT, SAMPLE_LIMIT - WINDOW), k)
+        for _ in range(20):
+            check_point(checker, rng.randrange(SAMPLE_LIMIT))
+        samples += 1
+    return checker, samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET,
+                        help="seconds to spend, including random sampling")
+    parser.add_argument('--seed', type=int, default=0, help="random sampling seed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    checker, samples = run(args.budget, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Differential tests ({elapsed:.1f} s, {samples} random windows, seed {args.seed})")
+    print("=" * 60)
+    for name, count in checker.checks.items():
+        print(f"  {name:<30} {count:>6} comparisons")
+    if checker.failures:
+        print(f"\n⚠ {len(checker.failures)} mismatches:")
+        for failure in checker.failures[:20]:
+            print(f"  {failure[:300]}")
+        return 1
+    print("\n✓ Every engine matches the reference")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
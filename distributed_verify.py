@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Multi-node verification through a shared directory
+A coordinator writes a manifest of shards covering [2, limit]. Worker nodes
+claim shards by creating lock files atomically (O_EXCL, which NFS honours),
+search them, and publish an HMAC-signed result file per shard; a running
+worker touches its lock every HEARTBEAT seconds. The coordinator re-issues
+claims whose lock has gone stale, so a lost node only costs the shard it was
+on, and merges the results once every shard has one: signatures, digests
+and engine versions are checked, the results must tile the manifest with no
+gaps or overlaps, and each shard is entered in the verified ledger.
+
+Layout of the shared directory:
+    manifest.json          limit, engine version and the shard list
+    claims/LO-HI.lock      one per claimed shard: node, token and claim time
+    results/LO-HI.json     one per finished shard: seeds, summaries, digest, signature
+
+Every node needs the same secret in SEED_SHARD_KEY to sign and check results.
+
+Usage:
+    python3 distributed_verify.py plan /shared/run 100000000000 [--shard-size N]
+    python3 distributed_verify.py work /shared/run [--node NAME] [--workers N]
+    python3 distributed_verify.py status /shared/run
+    python3 distributed_verify.py merge /shared/run [--ledger FILE]
+
+Author: Ian Shannon-Garvey
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from checkpoint_journal import _atomic_write, _fsync_directory
+from parallel_search import ParallelSearch
+from seed_search import ENGINE_VERSION, SegmentSummary, merge_records, search_with_summaries
+from verified_ledger import LEDGER_FILE, VerifiedLedger, results_digest
+
+MANIFEST = "manifest.json"
+CLAIMS = "claims"
+RESULTS = "results"
+
+# Environment variable holding the shared signing secret
+KEY_VARIABLE = "SEED_SHARD_KEY"
+
+# Default numbers per shard
+SHARD_SIZE = 10**9
+
+# Seconds between heartbeats of a running worker, and without one before
+# its claim is re-issued (allow for clock skew between nodes)
+HEARTBEAT = 30.0
+CLAIM_TIMEOUT = 600.0
+
+# Seconds an idle worker waits before looking for re-issued shards again
+POLL_INTERVAL = 60.0
+
+def signing_key():
+    """The shared secret from SEED_SHARD_KEY"""
+    key = os.environ.get(KEY_VARIABLE)
+    if not key:
+        raise SystemExit(f"Set {KEY_VARIABLE} to the secret shared by the coordinator and workers")
+    return key.encode()
+
+def _shard_name(lo, hi):
+    return f"{lo}-{hi}"
+
+def _sign(key, result):
+    """HMAC-SHA256 of a result's fields, excluding its signature"""
+    fields = {name: value for name, value in result.items() if name != 'signature'}
+    return hmac.new(key, json.dumps(fields, sort_keys=True).encode(), hashlib.sha256).hexdigest()
+
+def _summaries(records):
+    """SegmentSummary tuples from their JSON form"""
+    return [SegmentSummary(**dict(r, records=[tuple(x) for x in r['records']])) for r in records]
+
+def plan(directory, limit, shard_size=SHARD_SIZE):
+    """Create the shared directory and its manifest of shards covering [2, limit]"""
+    os.makedirs(os.path.join(directory, CLAIMS), exist_ok=True)
+    os.makedirs(os.path.join(directory, RESULTS), exist_ok=True)
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        raise ValueError(f"{path} already exists")
+    shards = [[lo, min(lo + shard_size, limit + 1)] for lo in range(2, limit + 1, shard_size)]
+    manifest = {'limit': limit, 'engine': ENGINE_VERSION, 'created': time.time(), 'shards': shards}
+    _atomic_write(path, json.dumps(manifest, indent=1).encode())
+    return manifest
+
+def load_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    manifest['shards'] = [tuple(shard) for shard in manifest['shards']]
+    return manifest
+
+class Claim:
+    """A worker's claim on one shard, kept alive by a heartbeat thread"""
+
+    def __init__(self, directory, lo, hi, node):
+        self.path = os.path.join(directory, CLAIMS, f"{_shard_name(lo, hi)}.lock")
+        self.token = uuid.uuid4().hex
+        self.stop = threading.Event()
+        self.thread = None
+        self.node = node
+
+    def acquire(self):
+        """Create the lock file; False if another worker holds the shard"""
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'node': self.node, 'pid': os.getpid(), 'token': self.token,
+                       'time': time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        self.thread = threading.Thread(target=self._beat, daemon=True)
+        self.thread.start()
+        return True
+
+    def held(self):
+        """Whether the lock file is still ours (the coordinator may have re-issued it)"""
+        try:
+            with open(self.path) as f:
+                return json.load(f).get('token') == self.token
+        except (OSError, ValueError):
+            return False
+
+    def _beat(self):
+        while not self.stop.wait(HEARTBEAT):
+            if self.held():
+                try:
+                    os.utime(self.path)
+                except OSError:
+                    pass
+
+    def release(self):
+        """Stop the heartbeat and remove the lock if it is still ours"""
+        self.stop.set()
+        if self.thread:
+            self.thread.join()
+        if self.held():
+            os.remove(self.path)
+
+def publish_result(directory, lo, hi, seeds, summaries, node, key):
+    """Write the signed result file of shard [lo, hi)"""
+    result = {
+        'lo': lo,
+        'hi': hi,
+        'seeds': sorted(seeds),
+        'summaries': [s._asdict() for s in summaries],
+        'engine': ENGINE_VERSION,
+        'digest': results_digest(lo, hi, seeds, summaries),
+        'node': node,
+        'time': time.time(),
+    }
+    result['signature'] = _sign(key, result)
+    path = os.path.join(directory, RESULTS, f"{_shard_name(lo, hi)}.json")
+    # A private temporary name: a re-issued shard may be published twice at once
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(result, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_directory(path)
+    return result
+
+def _finished(directory):
+    """Names of the shards that have a result file"""
+    return {name[:-len('.json')] for name in os.listdir(os.path.join(directory, RESULTS))
+            if name.endswith('.json')}
+
+def work(directory, node=None, workers=1, key=None, wait=True, verbose=True):
+    """Claim, search and publish shards until every shard has a result
+
+    With wait, a worker that finds every remaining shard claimed keeps
+    polling, so it picks up shards the coordinator re-issues. Returns the
+    number of shards this worker published.
+    """
+    key = key or signing_key()
+    node = node or f"{socket.gethostname()}:{os.getpid()}"
+    manifest = load_manifest(directory)
+    if manifest['engine'] != ENGINE_VERSION:
+        raise SystemExit(f"Manifest expects engine {manifest['engine']}, this is {ENGINE_VERSION}")
+    pool = ParallelSearch(manifest['limit'], workers) if workers > 1 else None
+    published = 0
+    try:
+        while True:
+            finished = _finished(directory)
+            todo = [s for s in manifest['shards'] if _shard_name(*s) not in finished]
+            if not todo:
+                return published
+            claimed = None
+            for lo, hi in todo:
+                claim = Claim(directory, lo, hi, node)
+                if claim.acquire():
+                    claimed = (lo, hi, claim)
+                    break
+            if claimed is None:
+                if not wait:
+                    return published
+                time.sleep(POLL_INTERVAL)
+                continue
+            lo, hi, claim = claimed
+            try:
+                if _shard_name(lo, hi) in _finished(directory):
+                    continue
+                start = time.perf_counter()
+                if pool:
+                    seeds, summaries = pool.search(lo, hi, verbose=False), pool.summaries
+                else:
+                    seeds, summaries = search_with_summaries(lo, hi)
+                publish_result(directory, lo, hi, seeds, summaries, node, key)
+                published += 1
+                if verbose:
+                    print(f"{node}: shard [{lo:,}, {hi:,}) done in "
+                          f"{time.perf_counter() - start:.1f} s, seeds {seeds}")
+            finally:
+                claim.release()
+    finally:
+        if pool:
+            pool.close()
+
+def status(directory, timeout=CLAIM_TIMEOUT, now=None):
+    """{'done', 'running', 'stale', 'unclaimed'}: shard lists by state"""
+    now = time.time() if now is None else now
+    finished = _finished(directory)
+    state = {'done': [], 'running': [], 'stale': [], 'unclaimed': []}
+    for lo, hi in load_manifest(directory)['shards']:
+        name = _shard_name(lo, hi)
+        lock = os.path.join(directory, CLAIMS, f"{name}.lock")
+        if name in finished:
+            state['done'].append((lo, hi))
+            continue
+        try:
+            age = now - os.stat(lock).st_mtime
+        except FileNotFoundError:
+            state['unclaimed'].append((lo, hi))
+            continue
+        state['stale' if age > timeout else 'running'].append((lo, hi))
+    return state
+
+def reissue_stale(directory, timeout=CLAIM_TIMEOUT, now=None):
+    """Remove the locks of claims with no heartbeat for timeout seconds; returns their shards"""
+    stale = status(directory, timeout, now)['stale']
+    for lo, hi in stale:
+        lock = os.path.join(directory, CLAIMS, f"{_shard_name(lo, hi)}.lock")
+        # Rename first: only one coordinator pass can win, and a late heartbeat
+        # from the lost worker no longer finds the file
+        moved = f"{lock}.stale-{uuid.uuid4().hex}"
+        try:
+            os.rename(lock, moved)
+        except FileNotFoundError:
+            continue
+        os.remove(moved)
+    return stale
+
+def merge(directory, ledger_file=LEDGER_FILE, key=None):
+    """Check every result against the manifest and enter the shards in the ledger
+
+    Returns {'recorded', 'missing', 'invalid', 'gaps', 'overlaps', 'seeds',
+    'witness_records'}; nothing is entered in the ledger unless every shard
+    has a valid result and together they tile [2, limit] with no gaps or
+    overlaps. Invalid result files are renamed to .rejected, which puts
+    their shards back up for claiming.
+    """
+    key = key or signing_key()
+    manifest = load_manifest(directory)
+    shards = set(manifest['shards'])
+    results = {}
+    invalid = []
+    for name in sorted(os.listdir(os.path.join(directory, RESULTS))):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, RESULTS, name)) as f:
+                result = json.load(f)
+            summaries = _summaries(result['summaries'])
+            lo, hi = result['lo'], result['hi']
+        except (ValueError, KeyError, TypeError):
+            invalid.append((name, "unreadable"))
+            continue
+        if not hmac.compare_digest(_sign(key, result), result.get('signature', '')):
+            invalid.append((name, "bad signature"))
+        elif name != f"{_shard_name(lo, hi)}.json":
+            invalid.append((name, "range does not match its file name"))
+        elif (lo, hi) not in shards:
+            invalid.append((name, "range is not a shard of the manifest"))
+        elif result['engine'] != manifest['engine']:
+            invalid.append((name, f"engine {result['engine']}"))
+        elif results_digest(lo, hi, result['seeds'], summaries) != result['digest']:
+            invalid.append((name, "digest does not match its contents"))
+        else:
+            results[(lo, hi)] = (result, summaries)
+    for name, _ in invalid:
+        path = os.path.join(directory, RESULTS, name)
+        os.replace(path, f"{path}.rejected")
+    # Together the results must cover [2, limit] exactly once
+    missing = sorted(shards - set(results))
+    ordered = sorted(results)
+    gaps = []
+    overlaps = []
+    cursor = 2
+    for lo, hi in ordered:
+        if lo > cursor:
+            gaps.append((cursor, lo))
+        elif lo < cursor:
+            overlaps.append((lo, min(hi, cursor)))
+        cursor = max(cursor, hi)
+    if cursor < manifest['limit'] + 1:
+        gaps.append((cursor, manifest['limit'] + 1))
+    report = {'recorded': 0, 'missing': missing, 'invalid': invalid,
+              'gaps': gaps, 'overlaps': overlaps,
+              'seeds': sorted(p for r, _ in results.values() for p in r['seeds']),
+              'witness_records': merge_records(s for _, ss in results.values() for s in ss)}
+    if missing or invalid or gaps or overlaps:
+        return report
+    ledger = VerifiedLedger(ledger_file)
+    covered = ledger.covered()
+    for lo, hi in ordered:
+        if any(c_lo <= lo and hi <= c_hi for c_lo, c_hi in covered):
+            continue
+        result, summaries = results[(lo, hi)]
+        ledger.record(lo, hi, result['seeds'], summaries)
+        report['recorded'] += 1
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    plan_parser = commands.add_parser('plan', help="write the shard manifest")
+    plan_parser.add_argument('directory')
+    plan_parser.add_argument('limit', type=int)
+    plan_parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    work_parser = commands.add_parser('work', help="claim and search shards")
+    work_parser.add_argument('directory')
+    work_parser.add_argument('--node')
+    work_parser.add_argument('--workers', type=int, default=1)
+    work_parser.add_argument('--no-wait', action='store_true',
+                             help="stop once every remaining shard is claimed")
+    status_parser = commands.add_parser('status', help="show shard states, re-issuing stale claims")
+    status_parser.add_argument('directory')
+    status_parser.add_argument('--timeout', type=float, default=CLAIM_TIMEOUT)
+    merge_parser = commands.add_parser('merge', help="check the results and record them in the ledger")
+    merge_parser.add_argument('directory')
+    merge_parser.add_argument('--ledger', default=LEDGER_FILE)
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        manifest = plan(args.directory, args.limit, args.shard_size)
+        print(f"{len(manifest['shards'])} shards up to {args.limit:,} in {args.directory}")
+    elif args.command == 'work':
+        count = work(args.directory, args.node, args.workers, wait=not args.no_wait)
+        print(f"Published {count} shards")
+    elif args.command == 'status':
+        for lo, hi in reissue_stale(args.directory, args.timeout):
+            print(f"Re-issued stale claim on [{lo:,}, {hi:,})")
+        for state, shards in status(args.directory, args.timeout).items():
+            print(f"  {state:<10} {len(shards)}")
+    else:
+        report = merge(args.directory, args.ledger)
+        for name, reason in report['invalid']:
+            print(f"  ⚠ {name}: {reason}")
+        for lo, hi in report['gaps']:
+            print(f"  ⚠ no result covers [{lo:,}, {hi:,})")
+        for lo, hi in report['overlaps']:
+            print(f"  ⚠ results overlap on [{lo:,}, {hi:,})")
+        if report['missing']:
+            print(f"  {len(report['missing'])} shards have no valid result yet")
+        if report['invalid'] or report['gaps'] or report['overlaps'] or report['missing']:
+            return 1
+        print(f"Recorded {report['recorded']} shards in {args.ledger}")
+        print(f"Seeds: {report['seeds']}")
+        if report['witness_records']:
+            p, a = report['witness_records'][-1]
+            print(f"Largest minimal witness: {p} needs a = {a}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,14 +7,9 @@ Author: Ian Shannon-Garvey
 Date: July 2025
 """
 
-def is_prime(n):
-    """Check if n is prime"""
-    if n < 2:
-        return False
-    for i in range(2, int(n**0.5) + 1):
-        if n % i == 0:
-            return False
-    return True
+from gap_rules import describe, explore
+from prime_sieve import is_prime
+from seed_search import seed_primes_in
 
 def analyze_gap_sequence():
     """Analyze the gaps between seed primes"""
@@ -95,34 +90,29 @@ def check_extended_seeds(limit):
     """Check if any primes beyond 167 are seed primes"""
     print(f"\n\nChecking for seed primes from 168 to {limit}...")
     
-    found = []
-    for n in range(168, limit + 1):
-        if is_prime(n):
-            is_seed = True
-            # Check if n can be written as p + 2q with p < q
-            for p in range(2, n//3 + 1):
-                if is_prime(p):
-                    remainder = n - p
-                    if remainder % 2 == 0:
-                        q = remainder // 2
-                        if q > p and is_prime(q):
-                            is_seed = False
-                            break
-            
-            if is_seed:
-                found.append(n)
-                print(f"Found seed prime: {n}")
+    found = seed_primes_in(168, limit + 1)
+    for n in found:
+        print(f"Found seed prime: {n}")
     
     if not found:
         print(f"No seed primes found between 168 and {limit}")
     
     return found
 
+def check_gap_rules(limit):
+    """Test the cascade and its neighbouring gap rules against the seeds up to limit"""
+    results = explore(limit)
+    print(f"\n\nGap rules reproducing the last 2+ known gaps, continued to {limit}:")
+    for result in results:
+        print(f"  {describe(result.rule)}: first non-seed {result.failure}")
+    return results
+
 def main():
     seeds, gaps = analyze_gap_sequence()
     
     # Quick check up to 10,000
     extended = check_extended_seeds(10000)
+    check_gap_rules(10000)
     
     if not extended:
         print("\n\nConclusion: The sequence of seed primes is complete at 8 terms.")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Gap-rule hypotheses for the seed primes, tested in bulk
+A gap rule says the gaps between seeds, from some point on, are a fixed
+multiplier times the terms of a sequence: the cascade 12 = 4·3·1, 60 = 4·3·5,
+84 = 4·3·7 is multiplier 12 over 1, 5, 7, 11, ... from the fifth gap. Each
+rule is scored by how many of the known gaps it reproduces, and its
+continuation past 167 is checked value by value against one shared table of
+primes and seeds, which grows only when a larger limit is asked for.
+Results are cached by rule and limit, so each further hypothesis costs
+table lookups rather than a fresh search.
+
+Usage:
+    python3 gap_rules.py [limit]
+
+Author: Ian Shannon-Garvey
+"""
+
+import sys
+import time
+from collections import namedtuple
+from functools import lru_cache
+from itertools import count, islice
+
+import prime_sieve
+from generation_engine import SEEDS
+from prime_sieve import primes_in
+from seed_search import seed_primes_in
+
+# ADJUST THIS VALUE TO CHANGE HOW FAR CONTINUATIONS ARE CHECKED
+RULE_LIMIT = 1000000
+
+# Rule family explored by default
+MULTIPLIERS = range(1, 61)
+SKIPS = range(4)
+
+# Rules kept by the cache
+RULE_CACHE = 1 << 16
+
+def _primes_from(start):
+    """Primes >= start, without bound"""
+    lo = start
+    while True:
+        yield from primes_in(lo, lo * 2 + 100)
+        lo = lo * 2 + 100
+
+def _cascade():
+    """1, then the primes from 5: the factors of 12, 60, 84 after 4·3"""
+    yield 1
+    yield from _primes_from(5)
+
+def _fibonacci():
+    a, b = 1, 2
+    while True:
+        yield a
+        a, b = b, a + b
+
+# Sequences a rule can scale, by name; each call starts a fresh iterator
+SEQUENCES = {
+    'primes': lambda: _primes_from(2),
+    'odd primes': lambda: _primes_from(3),
+    'cascade': _cascade,
+    'odd numbers': lambda: count(1, 2),
+    'naturals': lambda: count(1),
+    'powers of 2': lambda: (1 << i for i in count()),
+    'fibonacci': _fibonacci,
+    'triangular': lambda: (i * (i + 1) // 2 for i in count(1)),
+}
+
+# gap j (counted from gap offset) is multiplier × the (skip + j)-th term of sequence
+GapRule = namedtuple('GapRule', 'multiplier sequence skip offset')
+
+# fit: known gaps reproduced from offset on; consistent: all of them are (only
+# then is the continuation checked); predictions: continuation values past the
+# last seed up to the limit, with whether each is prime and a seed; failure:
+# the first predicted value that is not a seed
+RuleResult = namedtuple('RuleResult', 'rule fit consistent predictions primes seeds failure')
+
+def describe(rule):
+    """Human-readable form of a rule"""
+    terms = ', '.join(str(t) for t in islice(SEQUENCES[rule.sequence](), rule.skip, rule.skip + 4))
+    return f"gap {rule.offset + 1}+ = {rule.multiplier} × ({terms}, ...) [{rule.sequence}]"
+
+def gaps_of(seeds):
+    return tuple(seeds[i] - seeds[i - 1] for i in range(1, len(seeds)))
+
+def rule_gaps(rule):
+    """Gaps the rule predicts, from gap offset on, without bound"""
+    for term in islice(SEQUENCES[rule.sequence](), rule.skip, None):
+        yield rule.multiplier * term
+
+class SeedTable:
+    """Primes and seed primes up to a limit, extended incrementally"""
+
+    def __init__(self, k=2):
+        self.k = k
+        self.limit = 1
+        self.seeds = set()
+
+    def extend(self, limit):
+        """Make the table cover 0..limit, searching only the part not yet covered"""
+        if limit > self.limit:
+            prime_sieve.ensure(min(limit, prime_sieve.TABLE_LIMIT))
+            self.seeds.update(seed_primes_in(self.limit + 1, limit + 1, self.k))
+            self.limit = limit
+
+    def is_prime(self, n):
+        return prime_sieve.is_prime(n)
+
+    def is_seed(self, n):
+        """Whether n is a seed prime (n <= limit)"""
+        return n in self.seeds
+
+TABLE = SeedTable()
+
+@lru_cache(maxsize=RULE_CACHE)
+def evaluate(rule, limit, seeds=tuple(SEEDS)):
+    """RuleResult of rule against the known seeds, its continuation checked up to limit"""
+    known = gaps_of(seeds)[rule.offset:]
+    predicted = rule_gaps(rule)
+    fit = 0
+    for gap in known:
+        if next(predicted) != gap:
+            return RuleResult(rule, fit, False, (), (), (), None)
+        fit += 1
+    TABLE.extend(limit)
+    values = []
+    value = seeds[-1]
+    for gap in predicted:
+        value += gap
+        if value > limit:
+            break
+        values.append(value)
+    primes = tuple(TABLE.is_prime(v) for v in values)
+    is_seed = tuple(TABLE.is_seed(v) for v in values)
+    failure = next((v for v, s in zip(values, is_seed) if not s), None)
+    return RuleResult(rule, fit, True, tuple(values), primes, is_seed, failure)
+
+def rule_family(multipliers=MULTIPLIERS, sequences=tuple(SEQUENCES), skips=SKIPS,
+                offsets=None, seeds=SEEDS):
+    """Every rule with the given parameters; offsets default to every gap index"""
+    offsets = range(len(seeds) - 1) if offsets is None else offsets
+    return [GapRule(m, s, skip, o) for m in multipliers for s in sequences
+            for skip in skips for o in offsets]
+
+def explore(limit=RULE_LIMIT, rules=None, min_fit=2, seeds=SEEDS):
+    """Results of the consistent rules reproducing at least min_fit known gaps, best fit first
+
+    The shared table is extended to limit once, up front.
+    """
+    TABLE.extend(limit)
+    rules = rule_family(seeds=seeds) if rules is None else rules
+    results = [evaluate(rule, limit, tuple(seeds)) for rule in rules]
+    fitting = [r for r in results if r.consistent and r.fit >= min_fit]
+    fitting.sort(key=lambda r: (-r.fit, r.rule))
+    return fitting
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else RULE_LIMIT
+    print(f"Gap-rule hypotheses for the seed primes, continuations checked up to {limit:,}")
+    print("=" * 60)
+    print(f"Known gaps: {list(gaps_of(SEEDS))}")
+    start = time.perf_counter()
+    TABLE.extend(limit)
+    table_time = time.perf_counter() - start
+    rules = rule_family()
+    start = time.perf_counter()
+    results = explore(limit, rules)
+    elapsed = time.perf_counter() - start
+    print(f"Seed table up to {limit:,}: {table_time:.2f} s "
+          f"({len(TABLE.seeds)} seeds: {sorted(TABLE.seeds)})")
+    print(f"Evaluated {len(rules):,} rules in {elapsed:.2f} s "
+          f"({elapsed / len(rules) * 1000:.3f} ms each); {len(results)} reproduce the last 2+ known gaps")
+    print(f"\n{'fit':>3}  rule")
+    for result in results[:15]:
+        if result.failure is None:
+            verdict = "no prediction up to the limit" if not result.predictions else "all seeds"
+        else:
+            kind = "prime, not a seed" if prime_sieve.is_prime(result.failure) else "composite"
+            verdict = f"breaks at {result.failure} ({kind})"
+        print(f"{result.fit:>3}  {describe(result.rule)}: {verdict}")
+    if all(r.failure is not None or not r.predictions for r in results):
+        print("\nNo fitting rule predicts a further seed prime.")
+
+if __name__ == "__main__":
+    main()
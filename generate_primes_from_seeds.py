@@ -9,17 +9,16 @@ Date: July 2025
 
 # ADJUST THIS VALUE TO CHANGE THE VERIFICATION LIMIT
 VERIFY_LIMIT = 10000  # Generate and verify primes up to this value
+WORKERS = 1          # Worker processes for the generation closure (see parallel_generation.py)
+PRIME_CACHE = None      # Path of an on-disk prime bitmap to reuse across runs (see prime_cache.py)
 
-def is_prime(n):
-    """Check if n is prime"""
-    if n < 2:
-        return False
-    for i in range(2, int(n**0.5) + 1):
-        if n % i == 0:
-            return False
-    return True
+from generation_engine import UNGENERATED, FanoutIndex, GenerationStore, generation_closure
+from parallel_generation import parallel_generation_closure
+from prime_cache import use_cache
+from prime_sieve import primes_in
+from seed_search import representation_counts
 
-def verify_seed_generation_efficient(limit):
+def verify_seed_generation_efficient(limit, workers=1):
     """Efficiently verify that the 8 seed primes generate all other primes"""
     seeds = [2, 3, 5, 7, 11, 23, 83, 167]
     
@@ -27,56 +26,34 @@ def verify_seed_generation_efficient(limit):
     print(f"Seed primes: {seeds}")
     print("-" * 60)
     
-    # Get all primes up to limit
-    all_primes_list = [p for p in range(2, limit + 1) if is_prime(p)]
-    all_primes_set = set(all_primes_list)
-    
-    # Track which primes we can generate
-    generated = set(seeds)  # Start with seeds
-    generation_info = {}
-    
-    # Keep track of which generation each prime was found in
-    for seed in seeds:
-        if seed <= limit:
-            generation_info[seed] = (0, None)  # Generation 0, no parents
-    
-    generation = 0
-    new_found = True
-    
-    while new_found:
-        new_found = False
-        generation += 1
-        current_gen = sorted(list(generated))
-        new_in_generation = []
-        
-        # Try all combinations p + 2q with p < q from already generated primes
-        for i, p in enumerate(current_gen):
-            for j, q in enumerate(current_gen):
-                if p < q:  # Strict inequality
-                    r = p + 2 * q
-                    if r > limit:
-                        break  # No point checking further
-                    if r in all_primes_set and r not in generated:
-                        generated.add(r)
-                        generation_info[r] = (generation, (p, q))
-                        new_in_generation.append(r)
-                        new_found = True
-        
-        if new_in_generation:
-            print(f"Generation {generation}: Found {len(new_in_generation)} new primes")
-            if len(new_in_generation) <= 10:
-                print(f"  Examples: {sorted(new_in_generation[:10])}")
+    # Each generation only combines the previous one's new primes with
+    # everything generated so far (see generation_engine), optionally with
+    # the target values split across worker processes
+    if workers > 1:
+        depth, rounds = parallel_generation_closure(seeds, limit, workers=workers)
+    else:
+        depth, rounds = generation_closure(seeds, limit)
+    
+    for generation, new_in_generation in enumerate(rounds[1:], 1):
+        print(f"Generation {generation}: Found {len(new_in_generation)} new primes")
+        if len(new_in_generation) <= 10:
+            print(f"  Examples: {sorted(new_in_generation[:10])}")
+    
+    # Keep track of which generation each prime was found in, and its parents,
+    # in compact arrays keyed by prime index
+    generation_info = GenerationStore.from_closure(depth, rounds, limit)
+    primes_up_to_limit = generation_info.primes
+    generated = sum(generation_info.depth_counts())
     
     # Calculate coverage
-    primes_up_to_limit = [p for p in all_primes_list if p <= limit]
-    coverage = len(generated & set(primes_up_to_limit)) / len(primes_up_to_limit) * 100
+    coverage = generated / len(primes_up_to_limit) * 100
     
     # Find which primes weren't generated
-    not_generated = [p for p in primes_up_to_limit if p not in generated]
+    not_generated = [p for p, d in zip(primes_up_to_limit, generation_info.depth) if d == UNGENERATED]
     
     print(f"\nResults:")
     print(f"Total primes up to {limit:,}: {len(primes_up_to_limit)}")
-    print(f"Generated (including seeds): {len([p for p in generated if p <= limit])}")
+    print(f"Generated (including seeds): {generated}")
     print(f"Coverage: {coverage:.2f}%")
     
     if not_generated:
@@ -88,9 +65,10 @@ def verify_seed_generation_efficient(limit):
     # Show some generation examples
     print(f"\nExample generations:")
     examples_shown = 0
-    for p in sorted(all_primes_list):
-        if p in generation_info and generation_info[p][1] is not None:
-            gen, (parent_p, parent_q) = generation_info[p]
+    for p in primes_up_to_limit:
+        if generation_info.parents(p) is not None:
+            parent_p, parent_q = generation_info.parents(p)
+            gen = generation_info.generation(p)
             print(f"{p} = {parent_p} + 2×{parent_q} (generation {gen})")
             examples_shown += 1
             if examples_shown >= 10:
@@ -98,31 +76,31 @@ def verify_seed_generation_efficient(limit):
     
     return coverage == 100, generation_info
 
+def parent_count_histogram(parent_counts, primes):
+    """Histogram {number of parent pairs: number of primes} over the given primes"""
+    histogram = {}
+    for p in primes:
+        histogram[parent_counts[p]] = histogram.get(parent_counts[p], 0) + 1
+    return dict(sorted(histogram.items()))
+
 def analyze_generation_patterns(limit, generation_info):
-    """Analyze patterns in how primes are generated"""
+    """Analyze patterns in how primes are generated
+
+    Returns the parent pair counts as an array indexed by n.
+    """
     print("\n\nGeneration Pattern Analysis")
     print("=" * 60)
     
-    all_primes = [p for p in range(2, limit + 1) if is_prime(p)]
-    
-    # Count parent options for each prime
-    parent_counts = {}
-    for p in all_primes:
-        if p > 167:  # Beyond seed primes
-            count = 0
-            for p1 in all_primes:
-                if p1 >= p:
-                    break
-                remainder = p - p1
-                if remainder % 2 == 0:
-                    p2 = remainder // 2
-                    if p2 > p1 and is_prime(p2) and p2 <= p:
-                        count += 1
-            parent_counts[p] = count
+    all_primes = list(primes_in(2, limit + 1))
+    beyond_seeds = [p for p in all_primes if p > 167]
+    
+    # Count parent options for every n in one batched pass: the number of
+    # parent pairs p1 < p2 with p1 + 2*p2 = p is the representation count r(p)
+    parent_counts = representation_counts(0, limit + 1)
     
     # Find unique and hub primes
-    unique_primes = [p for p, count in parent_counts.items() if count == 1]
-    hub_primes = [(p, count) for p, count in parent_counts.items() if count > 5]
+    unique_primes = [p for p in beyond_seeds if parent_counts[p] == 1]
+    hub_primes = [(p, parent_counts[p]) for p in beyond_seeds if parent_counts[p] > 5]
     hub_primes.sort(key=lambda x: x[1], reverse=True)
     
     print(f"Analysis up to {limit:,}:")
@@ -136,20 +114,54 @@ def analyze_generation_patterns(limit, generation_info):
         for p, count in hub_primes[:5]:
             print(f"      {p}: {count} parent pairs")
     
+    # Full distribution of parent pair counts, shown in power-of-two buckets
+    histogram = parent_count_histogram(parent_counts, beyond_seeds)
+    if histogram:
+        print(f"\n  Parent pair count histogram (primes > 167):")
+        buckets = {}
+        for count, primes in histogram.items():
+            low = 1 << (count.bit_length() - 1) if count else 0
+            buckets[low] = buckets.get(low, 0) + primes
+        for low, primes in buckets.items():
+            high = max(2 * low - 1, low)
+            label = f"{low}" if high == low else f"{low}-{high}"
+            print(f"    {label:>11} pairs: {primes} primes")
+    
     # Generation depth analysis
     if generation_info:
-        max_gen = max(g[0] for g in generation_info.values() if g[0] is not None)
-        print(f"\n  Maximum generation depth: {max_gen}")
-        for gen in range(max_gen + 1):
-            count = len([p for p, (g, _) in generation_info.items() if g == gen])
+        depth_counts = generation_info.depth_counts()
+        print(f"\n  Maximum generation depth: {len(depth_counts) - 1}")
+        for gen, count in enumerate(depth_counts):
             print(f"    Generation {gen}: {count} primes")
+    
+    # Fan-out over the full generation graph: which primes are in the most pairs, as q and as p
+    if generation_info:
+        fanout = FanoutIndex(generation_info)
+        print(f"\n  Primes in no generating pair: {fanout.childless()}")
+        for role, term in (('q', 'larger term q'), ('p', 'smaller term p')):
+            print(f"    Top 5 as the {term}:")
+            for p, count in fanout.hubs(5, role):
+                print(f"      {p}: {count} generating pairs")
+    
+    # Full derivation of the largest prime, back to the seeds
+    if generation_info and generation_info.generation(generation_info.primes[-1]) is not None:
+        largest = generation_info.primes[-1]
+        steps = generation_info.derivation(largest)
+        print(f"\n  Derivation of {largest} from the seeds ({len(steps)} steps, last 5 shown):")
+        for r, p, q in steps[-5:]:
+            print(f"    {r} = {p} + 2×{q}")
+    
+    return parent_counts
 
 def main():
     print("8 Seed Prime Generation Verification")
     print("=" * 60)
     
+    if PRIME_CACHE:
+        use_cache(PRIME_CACHE, VERIFY_LIMIT)
+    
     # Main verification
-    success, generation_info = verify_seed_generation_efficient(VERIFY_LIMIT)
+    success, generation_info = verify_seed_generation_efficient(VERIFY_LIMIT, WORKERS)
     
     # Pattern analysis
     if success:
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Semi-naive bitset engine for the generation closure
+Repeatedly applies r = p + 2q (p < q) starting from the seed primes, but each
+generation only combines the primes added in the previous one with everything
+generated so far. The generated set is a Python int bitmap, so a new q adds
+every p + 2q at once by shifting the bits below q, and a new p adds every
+p + 2q by shifting a second bitmap that holds the doubled values 2q.
+Generation numbers and parents match the plain pair-by-pair loop. The
+coefficient k of q is a parameter (default 2) for the rule r = p + k·q.
+
+Author: Ian Shannon-Garvey
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import nlargest
+from itertools import accumulate
+
+from prime_sieve import primes_in, segment_flags
+from seed_search import _bits, _positions
+
+SEEDS = [2, 3, 5, 7, 11, 23, 83, 167]
+
+# Depth recorded for primes the closure never reaches
+UNGENERATED = 255
+
+# Parent pairs are first searched among the primes below this, one by one
+PARENT_SCAN_LIMIT = 256
+
+def _doubled(bits, k=2):
+    """Bitmap with bit kn set for every bit n set in bits"""
+    if k == 1:
+        return bits
+    return int(('0' * (k - 1)).join(bin(bits)[2:]), 2) if bits else 0
+
+def _products(delta, generated, doubled, limit, k=2):
+    """Bitmap of every r = p + kq <= limit with p < q generated and p or q in delta"""
+    new = 0
+    for q in delta:
+        # New q: every generated p below q
+        width = min(q, limit - k * q + 1)
+        if width > 0:
+            new |= (generated & ((1 << width) - 1)) << (k * q)
+    for p in delta:
+        # New p: every generated q above p, read off the doubled bitmap
+        width = limit - (k + 1) * p
+        if width > 0:
+            new |= ((doubled >> (k * p + 1)) & ((1 << width) - 1)) << ((k + 1) * p + 1)
+    return new
+
+def generation_closure(seeds, limit, k=2, primes=None):
+    """Generate the primes up to limit from seeds by r = p + kq (p < q)
+
+    Returns (depth, rounds): depth[n] is the generation in which prime n is
+    first produced (0 for seeds, UNGENERATED if never) and rounds[g] is the
+    sorted list of primes first produced in generation g. primes may pass
+    in the prime bitmap (_bits of the flags for 0..limit) to share it
+    across calls.
+    """
+    if primes is None:
+        primes = _bits(segment_flags(0, limit + 1))
+    depth = bytearray([UNGENERATED]) * (limit + 1)
+    delta = sorted(s for s in set(seeds) if s <= limit)
+    for s in delta:
+        depth[s] = 0
+    rounds = [delta]
+    generated = sum(1 << s for s in delta)
+
+    while delta:
+        doubled = _doubled(generated & ((1 << (limit // k + 1)) - 1), k)
+        new = _products(delta, generated, doubled, limit, k) & primes & ~generated
+        # Only now extend the generated set: new primes combine next generation
+        delta = list(_positions(new))
+        for r in delta:
+            depth[r] = len(rounds)
+        generated |= new
+        if delta:
+            rounds.append(delta)
+
+    return depth, rounds
+
+def first_parents(r, depth, primes, k=2):
+    """Pair (p, q) with smallest p, p < q, p + kq = r, both generated before r
+
+    primes is the ascending list of primes (at least up to r // 3); this is
+    the pair the plain pair-by-pair loop records for r.
+    """
+    g = depth[r]
+    for p in primes:
+        if (k + 1) * p >= r:
+            break
+        q, rem = divmod(r - p, k)
+        if not rem and depth[p] < g and depth[q] < g:
+            return p, q
+    return None
+
+def all_first_parents(depth, rounds, limit, k=2):
+    """Yield (r, p, q) with the first_parents pair of every generated non-seed r
+
+    Most pairs turn up within the first few small primes p; for the rest a
+    bitmap query finds the smallest p: with the doubled earlier generations
+    stored bit-reversed, the bits p with r - p = kq line up with the bits p
+    of the earlier generations. The query reads byte-aligned windows of p
+    that double in width from low p up, so it costs time in proportion to
+    the p it finds rather than to r; the reversed bitmap is kept at all
+    eight bit offsets so no window needs shifting or masking.
+    """
+    small = list(primes_in(2, min(PARENT_SCAN_LIMIT, limit + 1)))
+    size = (limit >> 3) + 2
+    flags = bytearray(limit + 1)
+    for g in range(1, len(rounds)):
+        for p in rounds[g - 1]:
+            flags[p] = 1
+        earlier_bytes = None
+        for r in rounds[g]:
+            for p in small:
+                if (k + 1) * p >= r:
+                    break
+                q, rem = divmod(r - p, k)
+                if not rem and depth[p] < g and depth[q] < g:
+                    yield r, p, q
+                    break
+            else:
+                if earlier_bytes is None:
+                    earlier = _bits(flags)
+                    doubled = _doubled(earlier & ((1 << (limit // k + 1)) - 1), k)
+                    # Bit limit - x of reversed is bit x of doubled; shifted[s] is
+                    # reversed without its lowest s bits
+                    reversed_doubled = int(format(doubled, f'0{limit + 1}b')[::-1], 2)
+                    shifted = [(reversed_doubled >> s).to_bytes(size, 'little') for s in range(8)]
+                    earlier_bytes = earlier.to_bytes(size, 'little')
+                # Candidates p < r / (k + 1) that pair with an earlier q = (r - p) / k
+                width = (r - 1) // (k + 1) + 1
+                offset = limit - r
+                window = shifted[offset & 7]
+                base = offset >> 3
+                lo, step = PARENT_SCAN_LIMIT, PARENT_SCAN_LIMIT
+                while lo < width:
+                    end = (min(lo + step, width) + 7) >> 3
+                    hits = (int.from_bytes(window[base + (lo >> 3):base + end], 'little')
+                            & int.from_bytes(earlier_bytes[lo >> 3:end], 'little'))
+                    if hits:
+                        p = lo + (hits & -hits).bit_length() - 1
+                        if p < width:
+                            yield r, p, (r - p) // k
+                        break
+                    lo, step = 8 * end, 2 * step
+
+class GenerationStore:
+    """Generation depth and parents of every prime up to a limit, keyed by prime index
+
+    Prime i is primes[i]; depth[i] is its generation (UNGENERATED if never
+    reached) and parent_p[i], parent_q[i] are the prime indices of the pair
+    that first produced it (-1 for seeds and ungenerated primes). At 10^8
+    this is a few bytes per prime instead of a dict of tuples.
+    """
+
+    def __init__(self, primes, depth, parent_p, parent_q, k=2):
+        self.primes = primes
+        self.depth = depth
+        self.parent_p = parent_p
+        self.parent_q = parent_q
+        self.k = k
+
+    @classmethod
+    def build(cls, seeds, limit, k=2):
+        """Run the generation closure up to limit and record every prime's derivation"""
+        depth_by_value, rounds = generation_closure(seeds, limit, k)
+        return cls.from_closure(depth_by_value, rounds, limit, k)
+
+    @classmethod
+    def from_closure(cls, depth_by_value, rounds, limit, k=2):
+        """Store for the result of generation_closure(seeds, limit, k)"""
+        primes = array('Q', primes_in(2, limit + 1))
+        depth = array('B', bytes(len(primes)))
+        for i, r in enumerate(primes):
+            depth[i] = depth_by_value[r]
+        parent_p = array('i', [-1]) * len(primes)
+        parent_q = array('i', [-1]) * len(primes)
+        for r, p, q in all_first_parents(depth_by_value, rounds, limit, k):
+            i = bisect_left(primes, r)
+            parent_p[i] = bisect_left(primes, p)
+            parent_q[i] = bisect_left(primes, q)
+        return cls(primes, depth, parent_p, parent_q, k)
+
+    def __len__(self):
+        return len(self.primes)
+
+    def index(self, p):
+        """Prime index of p (ValueError if p is not a prime in the store)"""
+        i = bisect_left(self.primes, p)
+        if i == len(self.primes) or self.primes[i] != p:
+            raise ValueError(f"{p} is not a prime up to {self.primes[-1] if self.primes else 0}")
+        return i
+
+    def generation(self, p):
+        """Generation in which p is first produced, or None if it never is"""
+        d = self.depth[self.index(p)]
+        return None if d == UNGENERATED else d
+
+    def parents(self, p):
+        """Pair (p1, q1) that first produced p, or None for seeds and ungenerated primes"""
+        i = self.index(p)
+        if self.parent_p[i] < 0:
+            return None
+        return self.primes[self.parent_p[i]], self.primes[self.parent_q[i]]
+
+    def derivation(self, p):
+        """Steps (r, p1, q1) deriving p from the seeds, parents before children
+
+        Each distinct ancestor is visited once, so the cost is linear in the
+        size of the derivation; no chain in it is longer than p's generation.
+        """
+        steps = []
+        seen = set()
+        stack = [(self.index(p), False)]
+        while stack:
+            i, expanded = stack.pop()
+            if self.parent_p[i] < 0:
+                if self.depth[i] == UNGENERATED:
+                    raise ValueError(f"{self.primes[i]} is not generated from the seeds")
+                continue
+            if expanded:
+                steps.append((self.primes[i], self.primes[self.parent_p[i]],
+                              self.primes[self.parent_q[i]]))
+            elif i not in seen:
+                seen.add(i)
+                stack.append((i, True))
+                stack.append((self.parent_q[i], False))
+                stack.append((self.parent_p[i], False))
+        return steps
+
+    def depth_counts(self):
+        """Number of primes in each generation, as a list indexed by generation"""
+        counts = [0] * (max((d for d in self.depth if d != UNGENERATED), default=0) + 1)
+        for d in self.depth:
+            if d != UNGENERATED:
+                counts[d] += 1
+        return counts
+
+def _csr(parents, count):
+    """(offsets, children) grouping the indices i by parents[i] (skipping -1)
+
+    The children of j are children[offsets[j]:offsets[j + 1]], ascending.
+    """
+    degree = Counter(parents)
+    offsets = array('I', accumulate((degree.get(j, 0) for j in range(count)), initial=0))
+    # A stable sort keeps each parent's children in ascending order
+    children = array('I', sorted((i for i in range(len(parents)) if parents[i] >= 0),
+                                 key=parents.__getitem__))
+    return offsets, children
+
+def pair_degrees(store):
+    """(degree_p, degree_q) over the full generation graph of a GenerationStore
+
+    The graph has an edge for every pair p < q of generated primes with
+    r = p + kq a prime in the store (r is then generated too). degree_q[i]
+    counts the pairs with primes[i] as q and degree_p[i] those with it as
+    p, by prime index. Each is one popcount of shifted bitmaps per prime,
+    so no edges are stored; the cost is a few passes over the bitmap per
+    prime below limit / k, about twice the closure itself.
+    """
+    k = store.k
+    top = store.primes[-1] if store.primes else 0
+    flags = bytearray(top + 1)
+    for p, d in zip(store.primes, store.depth):
+        if d != UNGENERATED:
+            flags[p] = 1
+    generated = _bits(flags)
+    doubled = _doubled(generated & ((1 << (top // k + 1)) - 1), k)
+    degree_p = array('I', bytes(4 * len(store)))
+    degree_q = array('I', bytes(4 * len(store)))
+    for i, x in enumerate(store.primes):
+        if k * x > top:
+            # Every pair from here on has r past the store
+            break
+        if not flags[x]:
+            continue
+        # As q: generated p < x with p + kx generated
+        degree_q[i] = ((generated >> (k * x)) & generated & ((1 << x) - 1)).bit_count()
+        # As p: generated q > x with x + kq generated, read off the doubled bitmap
+        shift = k * (x + 1)
+        degree_p[i] = ((doubled >> shift) & (generated >> (x + shift))).bit_count()
+    return degree_p, degree_q
+
+class FanoutIndex:
+    """Children and fan-out of every prime of a GenerationStore
+
+    children lists, in CSR form, the primes of the first-parent tree: each
+    generated prime r = p + kq has one parent pair (the first pair, as in
+    GenerationStore), which is what derivations follow. That tree's shape
+    reflects the smallest-p tie-break, so fan-out, hubs and childless
+    instead use the full generation graph of every generating pair (see
+    pair_degrees), whose edges are counted but never stored. Fan-out
+    lookups are two array reads.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        count = len(store)
+        self.offsets_p, self.children_p = _csr(store.parent_p, count)
+        self.offsets_q, self.children_q = _csr(store.parent_q, count)
+        # Filled in by the first fan-out query
+        self.degrees = None
+
+    def children(self, p, role='q'):
+        """First-parent-tree children of p, as the larger term q (role 'q') or smaller term p (role 'p')"""
+        i = self.store.index(p)
+        offsets, children = ((self.offsets_q, self.children_q) if role == 'q'
+                             else (self.offsets_p, self.children_p))
+        return [self.store.primes[j] for j in children[offsets[i]:offsets[i + 1]]]
+
+    def _fanout(self, i, role):
+        if self.degrees is None:
+            self.degrees = pair_degrees(self.store)
+        degree_p, degree_q = self.degrees
+        fanout = 0
+        if role in (None, 'q'):
+            fanout += degree_q[i]
+        if role in (None, 'p'):
+            fanout += degree_p[i]
+        return fanout
+
+    def fanout(self, p, role=None):
+        """Generation-graph pairs of p in the given role ('p', 'q', or None for both)"""
+        return self._fanout(self.store.index(p), role)
+
+    def hubs(self, count=10, role=None):
+        """The count primes with the most generation-graph pairs in role, as (p, fanout), largest first"""
+        top = nlargest(count, range(len(self.store)), key=lambda i: self._fanout(i, role))
+        return [(self.store.primes[i], self._fanout(i, role)) for i in top]
+
+    def childless(self):
+        """Number of primes in no generating pair of the generation graph"""
+        return sum(1 for i in range(len(self.store)) if not self._fanout(i, None))
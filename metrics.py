@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Hot-path metrics for long seed prime runs
+Counters for primality tests, sieved numbers and searched segments, a
+histogram of witness-search depth (how many a were tried before a witness
+turned up), and wall time per stage. Snapshots are appended to a JSON-lines
+file and written to a Prometheus textfile for the node exporter to scrape.
+
+The ETA comes from a cost curve fitted to the measured block timings: the
+cost per number grows with n, so a constant rate badly underestimates the
+end of a long run.
+
+Author: Ian Shannon-Garvey
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from math import exp, log
+
+# Prometheus metric name prefix
+PREFIX = 'seed_primes'
+
+# Upper bounds of the exported witness depth buckets
+DEPTH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096]
+
+# Blocks the cost curve is fitted to (the most recent ones)
+COST_WINDOW = 32
+
+class Metrics:
+    """Counters, witness depth histogram and stage timers of one process"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.counters = {}
+        # depth -> number of primes whose first witness was the depth-th a tried
+        self.depths = {}
+        self.stages = {}
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def depth(self, depth, amount=1):
+        """Record amount primes whose witness search took depth tries"""
+        self.depths[depth] = self.depths.get(depth, 0) + amount
+
+    @contextmanager
+    def stage(self, name):
+        """Add the wall time of the with-block to stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def snapshot(self):
+        """Plain dict of everything recorded so far (JSON-safe)"""
+        return {
+            'counters': dict(self.counters),
+            'depths': {str(d): c for d, c in sorted(self.depths.items())},
+            'stages': dict(self.stages),
+        }
+
+    def merge(self, snapshot):
+        """Add a snapshot taken in another process (e.g. a pool worker)"""
+        for name, amount in snapshot['counters'].items():
+            self.count(name, amount)
+        for depth, amount in snapshot['depths'].items():
+            self.depth(int(depth), amount)
+        for name, seconds in snapshot['stages'].items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+# Metrics of this process; hot paths record into it directly
+METRICS = Metrics()
+
+class CostCurve:
+    """Power-law fit of the cost per number against n, from measured blocks"""
+
+    def __init__(self, window=COST_WINDOW):
+        self.window = window
+        self.blocks = []
+
+    def add(self, lo, hi, seconds):
+        """Record that searching [lo, hi) took seconds"""
+        if hi > lo and seconds > 0:
+            self.blocks.append((lo, hi, seconds))
+            del self.blocks[:-self.window]
+
+    def fit(self):
+        """(c, k) with cost per number ~ c * n**k, or None before any block"""
+        if not self.blocks:
+            return None
+        points = [(log((lo + hi) / 2), log(s / (hi - lo))) for lo, hi, s in self.blocks]
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        var = sum((x - mean_x) ** 2 for x, _ in points)
+        k = sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var > 0 else 0.0
+        return exp(mean_y - k * mean_x), k
+
+    def seconds(self, intervals):
+        """Predicted seconds to search the (lo, hi) intervals, or None before any block"""
+        fitted = self.fit()
+        if fitted is None:
+            return None
+        c, k = fitted
+        total = 0.0
+        for lo, hi in intervals:
+            lo = max(lo, 1)
+            if hi <= lo:
+                continue
+            # Integral of c * n**k over [lo, hi)
+            if abs(k + 1) < 1e-9:
+                total += c * (log(hi) - log(lo))
+            else:
+                total += c * (hi ** (k + 1) - lo ** (k + 1)) / (k + 1)
+        return total
+
+def _atomic_text(path, text):
+    """Replace path with text via temporary file and rename (textfile collector safe)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def prometheus_text(metrics, gauges=None):
+    """Prometheus text exposition of metrics plus extra gauges {name: value}"""
+    lines = []
+    for name, value in sorted(metrics.counters.items()):
+        lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+        lines.append(f"{PREFIX}_{name}_total {value}")
+    lines.append(f"# TYPE {PREFIX}_witness_depth histogram")
+    cumulative = 0
+    depths = sorted(metrics.depths.items())
+    i = 0
+    for bound in DEPTH_BUCKETS:
+        while i < len(depths) and depths[i][0] <= bound:
+            cumulative += depths[i][1]
+            i += 1
+        lines.append(f'{PREFIX}_witness_depth_bucket{{le="{bound}"}} {cumulative}')
+    total = sum(c for _, c in depths)
+    lines.append(f'{PREFIX}_witness_depth_bucket{{le="+Inf"}} {total}')
+    lines.append(f"{PREFIX}_witness_depth_sum {sum(d * c for d, c in depths)}")
+    lines.append(f"{PREFIX}_witness_depth_count {total}")
+    lines.append(f"# TYPE {PREFIX}_stage_seconds_total counter")
+    for name, seconds in sorted(metrics.stages.items()):
+        lines.append(f'{PREFIX}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}')
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {PREFIX}_{name} gauge")
+        lines.append(f"{PREFIX}_{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+class MetricsExporter:
+    """Writes metric snapshots to a JSON-lines file and a Prometheus textfile
+
+    Either path may be None. write() is cheap to call often: it only writes
+    once every interval seconds unless forced.
+    """
+
+    def __init__(self, jsonl_path=None, prom_path=None, interval=10.0, metrics=METRICS):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self.metrics = metrics
+        self.last = 0.0
+
+    def write(self, gauges=None, force=False):
+        """Export the current metrics and gauges if the interval has passed (or force)"""
+        now = time.time()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        if self.jsonl_path:
+            record = {'time': now, 'elapsed': now - self.metrics.started,
+                      **self.metrics.snapshot(), 'gauges': dict(gauges or {})}
+            with open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        if self.prom_path:
+            _atomic_text(self.prom_path, prometheus_text(self.metrics, gauges))
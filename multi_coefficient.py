@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Seed sets and generation closures for p = a + k·b, k = 1..40, in one pass
+The generalisation of the seed prime definition to every coefficient k of
+b (k = 2 gives A385077). The range is walked once: each segment's prime
+bitmap is built once and filtered for every k, and the closures share one
+prime bitmap, so the sweep does not pay for 40 separate sieves and scans.
+
+For odd k an odd p = a + kb forces a = 2, so seeds are plentiful and the
+witness search per prime is a single test; for large even k seeds are
+common too, and the survivors of the pre-filter are settled in bulk.
+
+Usage:
+    python3 multi_coefficient.py [limit]
+
+Author: Ian Shannon-Garvey
+"""
+
+import sys
+import time
+from collections import namedtuple
+
+from generation_engine import UNGENERATED, generation_closure
+from prime_sieve import pi, primes_in, segment_flags
+from seed_search import SEARCH_SEGMENT, _bits, segment_seed_primes
+
+# ADJUST THIS VALUE TO CHANGE THE SWEEP LIMIT
+SWEEP_LIMIT = 100000
+
+COEFFICIENTS = range(1, 41)
+
+# seeds up to the limit, primes per generation, and the primes never generated
+CoefficientResult = namedtuple('CoefficientResult', 'k seeds generation_sizes missing')
+
+def seed_sets(lo, hi, coefficients=COEFFICIENTS):
+    """{k: seed primes p with lo <= p < hi for coefficient k}, in one pass over [lo, hi)"""
+    seeds = {k: [] for k in coefficients}
+    lo = max(lo, 2)
+    while lo < hi:
+        seg_hi = min(lo + SEARCH_SEGMENT, hi)
+        candidates = _bits(segment_flags(lo, seg_hi))
+        for k in coefficients:
+            seeds[k].extend(segment_seed_primes(lo, seg_hi, k, candidates))
+        lo = seg_hi
+    return seeds
+
+def coefficient_sweep(limit, coefficients=COEFFICIENTS):
+    """CoefficientResult for every k: its seeds up to limit and their generation closure"""
+    seeds = seed_sets(2, limit + 1, coefficients)
+    primes = _bits(segment_flags(0, limit + 1))
+    results = {}
+    for k in coefficients:
+        depth, rounds = generation_closure(seeds[k], limit, k, primes)
+        missing = [p for p in primes_in(2, limit + 1) if depth[p] == UNGENERATED]
+        results[k] = CoefficientResult(k, seeds[k], [len(r) for r in rounds], missing)
+    return results
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else SWEEP_LIMIT
+    print(f"Seed sets for p = a + k·b, k = {COEFFICIENTS[0]}..{COEFFICIENTS[-1]}, up to {limit:,}")
+    print("=" * 60)
+    start = time.perf_counter()
+    results = coefficient_sweep(limit)
+    elapsed = time.perf_counter() - start
+    total = pi(limit)
+    print(f"{'k':>3} {'seeds':>8} {'largest':>10} {'generations':>12} {'coverage':>9}")
+    for k, result in results.items():
+        largest = result.seeds[-1] if result.seeds else '-'
+        coverage = (total - len(result.missing)) / total * 100
+        print(f"{k:>3} {len(result.seeds):>8,} {largest:>10} "
+              f"{len(result.generation_sizes) - 1:>12} {coverage:>8.2f}%")
+        if k <= 12 and len(result.seeds) <= 12:
+            print(f"      {result.seeds}")
+    print(f"\nSweep time: {elapsed:.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Multi-core generation closure over shared-memory bitmaps
+The semi-naive closure of generation_engine with the target values r split
+across a process pool. Each worker owns a byte-aligned range of r. Every
+round it reads the generated bitmap from shared memory, adds every
+r = p + kq in its range with p or q among the previous round's new primes,
+and publishes the new primes in its bytes of a shared output bitmap. The
+parent merges them, numbers the generation and starts the next round until
+no worker finds anything new. The rounds are the same sets as in the
+sequential closure, so generation numbers match it exactly.
+
+Author: Ian Shannon-Garvey
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+from multiprocessing import Pool, shared_memory
+
+from generation_engine import UNGENERATED, _doubled
+from prime_sieve import segment_flags
+from seed_search import _bits, _positions
+
+# Target ranges per worker: more ranges even out the uneven cost across r
+RANGES_PER_WORKER = 4
+
+# Worker state: limit, coefficient and the shared blocks
+_state = {}
+
+def _init_worker(limit, k, primes_name, generated_name, new_name):
+    """Pool initializer: attach the shared prime, generated and output bitmaps"""
+    _state['limit'] = limit
+    _state['k'] = k
+    _state['blocks'] = [shared_memory.SharedMemory(name=name)
+                        for name in (primes_name, generated_name, new_name)]
+
+def _read(buf, lo, hi):
+    """Bits lo..hi-1 of a little-endian shared bitmap as a Python int"""
+    if hi <= lo:
+        return 0
+    chunk = int.from_bytes(buf[lo >> 3:(hi + 7) >> 3], 'little')
+    return (chunk >> (lo & 7)) & ((1 << (hi - lo)) - 1)
+
+def _generate_range(task):
+    """New primes r in [lo, hi) this round, written to the shared output bitmap
+
+    lo and hi are multiples of 8, so each worker writes only its own bytes.
+    Each new prime reads only the bits of its partners that land in the
+    range, so a range costs time in proportion to its width. Returns how
+    many primes it found.
+    """
+    lo, hi, delta = task
+    limit, k = _state['limit'], _state['k']
+    primes_buf, generated_buf, new_buf = (block.buf for block in _state['blocks'])
+    top = min(hi, limit + 1)
+    width = top - lo
+    new = 0
+    # Only q with p + kq in [lo, top) for some p < q
+    first, last = bisect_right(delta, lo // (k + 1)), bisect_left(delta, -(-top // k))
+    for q in delta[first:last]:
+        # New q: every generated p < q with r = p + kq in [lo, top)
+        p_lo = max(lo - k * q, 0)
+        p_hi = min(q, top - k * q)
+        if p_lo < p_hi:
+            new |= _read(generated_buf, p_lo, p_hi) << (p_lo + k * q - lo)
+    if delta:
+        # New p: every generated q > p with r in [lo, top), read off the doubled
+        # q bitmap, which is spread k bits apart once per range
+        q0 = max((lo - max(delta)) // k, 0)
+        q1 = max((top - 1 - min(delta)) // k + 1, q0)
+        doubled = _doubled(_read(generated_buf, q0, q1), k)
+        doubled = doubled.to_bytes((k * (q1 - q0) + 7) >> 3, 'little')
+        # Only p with p + kq < top for some q > p
+        for p in delta[:bisect_left(delta, -(-top // (k + 1)))]:
+            q_lo = max(p + 1, -(-(lo - p) // k), q0)
+            q_hi = min((top - 1 - p) // k + 1, q1)
+            if q_lo < q_hi:
+                start = k * (q_lo - q0)
+                bits = _read(doubled, start, start + k * (q_hi - q_lo - 1) + 1)
+                new |= bits << (p + k * q_lo - lo)
+    new &= _read(primes_buf, lo, top) & ~_read(generated_buf, lo, top)
+    new &= (1 << width) - 1
+    new_buf[lo >> 3:hi >> 3] = new.to_bytes((hi - lo) >> 3, 'little')
+    return new.bit_count()
+
+def split_targets(limit, count):
+    """Split 0..limit into count byte-aligned ranges [lo, hi)"""
+    size = (limit >> 3) + 1
+    count = max(1, min(count, size))
+    bounds = [8 * (size * i // count) for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
+
+def parallel_generation_closure(seeds, limit, k=2, workers=None):
+    """generation_closure(seeds, limit, k) computed on a process pool; same (depth, rounds)"""
+    workers = workers or os.cpu_count() or 1
+    size = (limit >> 3) + 1
+    ranges = split_targets(limit, workers * RANGES_PER_WORKER)
+    blocks = [shared_memory.SharedMemory(create=True, size=size) for _ in range(3)]
+    primes_block, generated_block, new_block = blocks
+    try:
+        primes_block.buf[:size] = _bits(segment_flags(0, limit + 1)).to_bytes(size, 'little')
+        depth = bytearray([UNGENERATED]) * (limit + 1)
+        delta = sorted(s for s in set(seeds) if s <= limit)
+        for s in delta:
+            depth[s] = 0
+        rounds = [delta]
+        generated = sum(1 << s for s in delta)
+        with Pool(workers, _init_worker, (limit, k, primes_block.name,
+                                          generated_block.name, new_block.name)) as pool:
+            while delta:
+                generated_block.buf[:size] = generated.to_bytes(size, 'little')
+                found = pool.map(_generate_range, [(lo, hi, delta) for lo, hi in ranges])
+                if not sum(found):
+                    break
+                new = int.from_bytes(new_block.buf[:size], 'little')
+                delta = list(_positions(new))
+                for r in delta:
+                    depth[r] = len(rounds)
+                generated |= new
+                rounds.append(delta)
+        return depth, rounds
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
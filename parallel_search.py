@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Multi-core seed prime search
+Hands a range out to a process pool one work unit at a time and merges the
+seed lists in order. Units are sized by segment_scheduler from the measured
+throughput, and each worker takes the next unit as soon as it finishes one,
+so uneven costs along the range balance out. Workers read one prime table
+through shared memory instead of each sieving their own (and map the on-disk
+prime cache past it when one is attached), and each unit reports its own progress.
+
+Author: Ian Shannon-Garvey
+"""
+
+import os
+import queue
+import time
+from multiprocessing import Array, Pool
+
+import prime_sieve
+from metrics import METRICS
+from prime_cache import PrimeCache
+from prime_sieve import TABLE_LIMIT
+from seed_search import SEARCH_SEGMENT, search_with_summaries
+from segment_scheduler import AdaptiveScheduler
+
+# Units in flight per worker, so a worker never waits for its next unit
+UNITS_IN_FLIGHT = 2
+
+# Seconds a work unit should take
+UNIT_SECONDS = 1.0
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 10.0
+
+# Numbers done in the unit in each in-flight slot, shared with the workers
+_progress = None
+
+def _init_worker(table_name, table_size, cache_path, progress):
+    """Pool initializer: attach the shared prime table, the cache past it and progress counters"""
+    global _progress
+    prime_sieve.attach_table(table_name, table_size)
+    if cache_path is not None:
+        prime_sieve.attach_cache(PrimeCache(cache_path, verify=False))
+    _progress = progress
+
+def _search_unit(task):
+    """Search one unit segment by segment, publishing progress as it goes
+
+    Returns the unit's segment summaries, metrics and search time with its
+    seeds, for the parent to merge.
+    """
+    slot, lo, hi, segment = task
+    start = time.perf_counter()
+    METRICS.reset()
+    seeds = []
+    summaries = []
+    for seg_lo in range(lo, hi, segment):
+        seg_hi = min(seg_lo + segment, hi)
+        found, summary = search_with_summaries(seg_lo, seg_hi, segment=segment)
+        seeds.extend(found)
+        summaries.extend(summary)
+        _progress[slot] = seg_hi - lo
+    return slot, lo, hi, seeds, summaries, METRICS.snapshot(), time.perf_counter() - start
+
+class ParallelSearch:
+    """Process pool sharing one prime table, reused across calls to search()
+
+    Use as a context manager so the pool and shared table are released.
+    """
+
+    def __init__(self, limit, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        # The table covers every n and b up to limit (capped like the local table)
+        self.table_size = min(limit, TABLE_LIMIT) + 1
+        self.table = prime_sieve.share_table(self.table_size - 1)
+        cache = prime_sieve.attached_cache()
+        # Past the table, workers map the same cache file; the page cache is shared
+        cache_path = cache.path if cache is not None and limit > TABLE_LIMIT else None
+        self.progress = Array('q', self.workers * UNITS_IN_FLIGHT, lock=False)
+        # Segment summaries of the last search, in order
+        self.summaries = []
+        self.pool = Pool(self.workers, _init_worker,
+                         (self.table.name, self.table_size, cache_path,
+                          self.progress))
+
+    def search(self, lo, hi, verbose=True, segment=SEARCH_SEGMENT):
+        """Return the seed primes in [lo, hi), searched unit by unit in parallel
+
+        Every slot keeps one unit in flight; when a unit finishes, its slot
+        gets the next one, sized from the throughput measured so far.
+        """
+        scheduler = AdaptiveScheduler([(lo, hi)], UNIT_SECONDS, self.workers, segment)
+        finished = queue.Queue()
+        running = {}
+        results = {}
+        summaries = {}
+        done = 0
+
+        def submit(slot):
+            unit = scheduler.next_unit()
+            if unit is not None:
+                self.progress[slot] = 0
+                running[slot] = unit
+                self.pool.apply_async(_search_unit, ((slot, *unit, segment),),
+                                      callback=finished.put, error_callback=finished.put)
+
+        for slot in range(len(self.progress)):
+            submit(slot)
+        last_report = time.monotonic()
+        while running:
+            try:
+                result = finished.get(timeout=PROGRESS_INTERVAL)
+            except queue.Empty:
+                result = None
+            if isinstance(result, BaseException):
+                raise result
+            if result is not None:
+                slot, u_lo, u_hi, seeds, unit_summaries, snapshot, seconds = result
+                del running[slot]
+                scheduler.record(u_lo, u_hi, seconds)
+                results[u_lo] = seeds
+                summaries[u_lo] = unit_summaries
+                METRICS.merge(snapshot)
+                done += u_hi - u_lo
+                submit(slot)
+            if verbose and running and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                self.report(running, done, hi - lo)
+                last_report = time.monotonic()
+        self.summaries = [s for u_lo in sorted(summaries) for s in summaries[u_lo]]
+        return [p for u_lo in sorted(results) for p in results[u_lo]]
+
+    def report(self, running, done, total):
+        """Print overall progress and how far each running unit has got"""
+        done += sum(self.progress[slot] for slot in running)
+        print(f"  [{time.strftime('%H:%M:%S')}] {done:,}/{total:,} numbers searched")
+        for slot, (lo, hi) in sorted(running.items(), key=lambda item: item[1]):
+            print(f"    unit [{lo:,}, {hi:,}): {self.progress[slot] / (hi - lo) * 100:.0f}%")
+
+    def close(self):
+        """Stop the workers and free the shared table"""
+        self.pool.terminate()
+        self.pool.join()
+        if self.table is not None:
+            self.table.close()
+            self.table.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def parallel_seed_primes(lo, hi, workers=None):
+    """Return the seed primes in [lo, hi) using a process pool"""
+    with ParallelSearch(hi - 1, workers) as search:
+        return search.search(lo, hi, verbose=False)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Single-pass verification pipeline
+Runs the seed search, the generation closure, the parent pair analysis and
+the gap checks as stages over one shared prime table, built once up front,
+and prints one combined report. Replaces running verify_seed_primes.py,
+generate_primes_from_seeds.py and gap_analysis.py one after another, each
+sieving its own overlapping range.
+
+Usage:
+    python3 pipeline.py 1000000
+    python3 pipeline.py 100000000 --workers 8 --cache primes.bin --json report.json
+
+Author: Ian Shannon-Garvey
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import prime_sieve
+from generation_engine import SEEDS, UNGENERATED, FanoutIndex, GenerationStore, generation_closure
+from metrics import METRICS
+from parallel_generation import parallel_generation_closure
+from parallel_search import ParallelSearch
+from prime_cache import use_cache
+from prime_sieve import TABLE_LIMIT, is_prime, pi
+from seed_search import merge_records, representation_counts, search_with_summaries
+
+STAGES = ['search', 'generation', 'parents', 'gaps']
+
+# Parent pair counts above this make a prime a hub
+HUB_THRESHOLD = 5
+
+def stage_search(context):
+    """Seed primes up to the limit, and the minimal witness records"""
+    limit = context['limit']
+    if context['workers'] > 1:
+        with ParallelSearch(limit, context['workers']) as search:
+            seeds = search.search(2, limit + 1, verbose=False)
+            summaries = search.summaries
+    else:
+        seeds, summaries = search_with_summaries(2, limit + 1)
+    context['seeds'] = seeds
+    return {'seeds': seeds, 'expected': seeds == [s for s in SEEDS if s <= limit],
+            'witness_records': merge_records(summaries)}
+
+def stage_generation(context):
+    """Generation closure of the seeds up to the limit, with every prime's parents"""
+    limit = context['limit']
+    if context['workers'] > 1:
+        depth, rounds = parallel_generation_closure(SEEDS, limit, workers=context['workers'])
+    else:
+        depth, rounds = generation_closure(SEEDS, limit)
+    store = GenerationStore.from_closure(depth, rounds, limit)
+    context['store'] = store
+    missing = [p for p, d in zip(store.primes, store.depth) if d == UNGENERATED]
+    return {
+        'primes': len(store),
+        'generated': len(store) - len(missing),
+        'coverage': (len(store) - len(missing)) / len(store) * 100 if len(store) else 100.0,
+        'missing': missing[:20],
+        'generation_sizes': store.depth_counts(),
+    }
+
+def stage_parents(context):
+    """Unique and hub primes by number of parent pairs, beyond the seeds"""
+    limit = context['limit']
+    counts = representation_counts(0, limit + 1)
+    beyond = list(prime_sieve.primes_in(SEEDS[-1] + 1, limit + 1))
+    unique = [p for p in beyond if counts[p] == 1]
+    hubs = sorted(((p, counts[p]) for p in beyond if counts[p] > HUB_THRESHOLD),
+                  key=lambda hub: hub[1], reverse=True)
+    result = {
+        'unique': len(unique),
+        'first_unique': unique[:10],
+        'hubs': len(hubs),
+        'top_hubs': hubs[:5],
+    }
+    if 'store' in context:
+        # Fan-out over the full generation graph: which primes take part in the most pairs
+        fanout = FanoutIndex(context['store'])
+        result['childless'] = fanout.childless()
+        result['top_fanout_q'] = fanout.hubs(5, 'q')
+        result['top_fanout_p'] = fanout.hubs(5, 'p')
+    return result
+
+def stage_gaps(context):
+    """Gaps between the seeds, the cascade continuation, and seeds beyond 167"""
+    seeds = context.get('seeds', SEEDS)
+    gaps = [seeds[i] - seeds[i - 1] for i in range(1, len(seeds))]
+    next_candidate = SEEDS[-1] + 4 * 3 * 11
+    beyond = [p for p in seeds if p > SEEDS[-1]]
+    return {
+        'gaps': gaps,
+        'next_candidate': next_candidate,
+        'next_candidate_prime': is_prime(next_candidate),
+        'seeds_beyond_167': beyond,
+    }
+
+_STAGE_FUNCTIONS = {
+    'search': stage_search,
+    'generation': stage_generation,
+    'parents': stage_parents,
+    'gaps': stage_gaps,
+}
+
+def run_pipeline(limit, stages=STAGES, workers=1, cache=None):
+    """Build the prime table once, run the stages in order; returns the combined report"""
+    context = {'limit': limit, 'workers': workers}
+    report = {'limit': limit, 'stages': {}, 'seconds': {}}
+    with METRICS.stage('prime_table'):
+        if cache:
+            use_cache(cache, limit)
+        else:
+            prime_sieve.ensure(min(limit, TABLE_LIMIT))
+    report['seconds']['prime_table'] = METRICS.stages['prime_table']
+    report['primes'] = pi(limit)
+    for name in STAGES:
+        if name not in stages:
+            continue
+        start = time.perf_counter()
+        with METRICS.stage(name):
+            report['stages'][name] = _STAGE_FUNCTIONS[name](context)
+        report['seconds'][name] = time.perf_counter() - start
+    report['numbers_sieved'] = METRICS.counters.get('numbers_sieved', 0)
+    return report
+
+def print_report(report):
+    """Human-readable summary of a pipeline report"""
+    limit = report['limit']
+    stages = report['stages']
+    print("Seed Prime Verification Pipeline")
+    print("=" * 60)
+    print(f"Limit: {limit:,} ({report['primes']:,} primes, "
+          f"{report['numbers_sieved']:,} numbers sieved)")
+    if 'search' in stages:
+        result = stages['search']
+        print(f"\nSearch: {len(result['seeds'])} seed primes: {result['seeds']}")
+        if result['witness_records']:
+            p, a = result['witness_records'][-1]
+            print(f"  Largest minimal witness: {p} needs a = {a} "
+                  f"({len(result['witness_records'])} records)")
+    if 'generation' in stages:
+        result = stages['generation']
+        print(f"\nGeneration: {result['generated']:,}/{result['primes']:,} primes "
+              f"({result['coverage']:.2f}%) in {len(result['generation_sizes']) - 1} generations")
+        if result['missing']:
+            print(f"  Missing primes: {result['missing']}...")
+    if 'parents' in stages:
+        result = stages['parents']
+        print(f"\nParents: {result['unique']:,} unique primes, {result['hubs']:,} hub primes")
+        for p, count in result['top_hubs']:
+            print(f"  {p}: {count} parent pairs")
+        if 'childless' in result:
+            print(f"Generation graph (every generating pair): "
+                  f"{result['childless']:,} primes are in no pair")
+            for role, term in (('q', 'larger'), ('p', 'smaller')):
+                top = ', '.join(f"{p} ({count})" for p, count in result[f'top_fanout_{role}'])
+                print(f"  Most pairs as the {term} term: {top}")
+    if 'gaps' in stages:
+        result = stages['gaps']
+        verdict = "prime" if result['next_candidate_prime'] else "composite"
+        print(f"\nGaps: {result['gaps']}")
+        print(f"  Next candidate 167 + 4×3×11 = {result['next_candidate']} is {verdict}")
+        print(f"  Seed primes beyond 167: {result['seeds_beyond_167'] or 'none'}")
+    print("\nStage times:")
+    for name, seconds in report['seconds'].items():
+        print(f"  {name:<12} {seconds:9.3f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('limit', type=int, help="verify everything up to this value")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help="stages to run (default: all)")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes for the search and generation")
+    parser.add_argument('--cache', help="on-disk prime cache to use (see prime_cache.py)")
+    parser.add_argument('--json', help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = run_pipeline(args.limit, args.stages, args.workers, args.cache)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+    search = report['stages'].get('search')
+    generation = report['stages'].get('generation')
+    ok = ((search is None or search['expected'])
+          and (generation is None or not generation['missing']))
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk prime bitmap cache
+One bit per odd number, behind a versioned header with the covered limit and
+a CRC32 of the bitmap. The file is built once, memory-mapped read-only by any
+script or worker process, and extended in place when a larger limit is asked
+for: new bytes are appended and fsync'ed before the header is rewritten, so a
+crash mid-extension leaves the old cache intact.
+
+Author: Ian Shannon-Garvey
+"""
+
+import mmap
+import os
+import struct
+import zlib
+
+import prime_sieve
+from checkpoint_journal import _atomic_write
+from prime_sieve import SEGMENT_SIZE, sieve_segment
+
+MAGIC = b'SEEDPBMP'
+VERSION = 1
+
+# magic, version, covered limit, CRC32 of the bitmap
+_HEADER = struct.Struct('<8sH6xQI4x')
+
+# Numbers covered per bitmap byte (eight odd numbers)
+_SPAN = 16
+
+_ASCII_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+# Maps each byte to its bit reversal, so a bitmap read big-endian lists
+# its bits lowest first
+_REVERSED = bytes(int(f'{b:08b}'[::-1], 2) for b in range(256))
+
+# ASCII '0'/'1' to 0/1 flag bytes
+_FLAG_DIGITS = bytes.maketrans(b'01', b'\x00\x01')
+
+def _covered(limit):
+    """Limit actually covered when asked for limit (whole bitmap bytes)"""
+    return (limit // _SPAN + 1) * _SPAN - 1
+
+def _pack_odd(lo, hi):
+    """Bitmap bytes for the odd numbers in [lo, hi); lo and hi are multiples of 16"""
+    odd = sieve_segment(lo, hi)[1::2]
+    if lo == 0:
+        # 2 is kept out of the bitmap, and 1 is not prime
+        odd[0] = 0
+    return int(bytes(odd[::-1]).translate(_ASCII_DIGITS), 2).to_bytes(len(odd) // 8, 'little')
+
+def _read_header(f, path):
+    """(limit, crc) from the header of an open cache file"""
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != MAGIC:
+        raise ValueError(f"{path} is not a prime bitmap cache")
+    _, version, limit, crc = _HEADER.unpack(header)
+    if version != VERSION:
+        raise ValueError(f"{path} has cache version {version}, expected {VERSION}")
+    return limit, crc
+
+def build_cache(path, limit):
+    """Create the cache at path, or extend it in place, so that it covers 0..limit
+
+    Only one process should build or extend a given cache at a time; readers
+    may keep their maps open while it grows.
+    """
+    limit = _covered(limit)
+    if not os.path.exists(path):
+        first = _pack_odd(0, _SPAN)
+        _atomic_write(path, _HEADER.pack(MAGIC, VERSION, _SPAN - 1, zlib.crc32(first)) + first)
+    with open(path, 'r+b') as f:
+        old, crc = _read_header(f, path)
+        if old >= limit:
+            return
+        # Drop anything a crashed extension appended past the header's limit
+        f.truncate(_HEADER.size + (old + 1) // _SPAN)
+        f.seek(0, os.SEEK_END)
+        lo = old + 1
+        while lo <= limit:
+            hi = min(lo + SEGMENT_SIZE, limit + 1)
+            chunk = _pack_odd(lo, hi)
+            f.write(chunk)
+            crc = zlib.crc32(chunk, crc)
+            lo = hi
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, limit, crc))
+        f.flush()
+        os.fsync(f.fileno())
+
+class PrimeCache:
+    """Read-only memory map of a prime bitmap cache file"""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.limit, crc = _read_header(f, path)
+            size = (self.limit + 1) // _SPAN
+            if os.fstat(f.fileno()).st_size < _HEADER.size + size:
+                raise ValueError(f"{path} is truncated")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.bits = memoryview(self.map)[_HEADER.size:_HEADER.size + size]
+        if verify and zlib.crc32(self.bits) != crc:
+            self.close()
+            raise ValueError(f"{path} fails its checksum")
+
+    def is_prime(self, n):
+        """Check if n is prime, for 0 <= n <= limit"""
+        if n % 2 == 0:
+            return n == 2
+        i = n >> 1
+        return (self.bits[i >> 3] >> (i & 7)) & 1 == 1
+
+    def segment_flags(self, lo, hi):
+        """Prime flags for [lo, hi) as a bytearray, for 0 <= lo <= hi <= limit + 1"""
+        flags = bytearray(hi - lo)
+        first = lo | 1
+        if first < hi:
+            # Odd n = 2i + 1 for i in [i_lo, i_hi)
+            i_lo, i_hi = first >> 1, hi >> 1
+            byte_lo = i_lo >> 3
+            chunk = self.bits[byte_lo:(i_hi + 7) >> 3].tobytes().translate(_REVERSED)
+            odd = format(int.from_bytes(chunk, 'big'), f'0{8 * len(chunk)}b').encode()
+            flags[first - lo::2] = odd[i_lo - 8 * byte_lo:i_hi - 8 * byte_lo].translate(_FLAG_DIGITS)
+        if lo <= 2 < hi:
+            flags[2 - lo] = 1
+        return flags
+
+    def close(self):
+        self.bits.release()
+        self.map.close()
+
+def use_cache(path, limit, verify=True):
+    """Build or extend the cache at path to cover limit and serve prime_sieve lookups from it"""
+    build_cache(path, limit)
+    cache = PrimeCache(path, verify)
+    prime_sieve.attach_cache(cache)
+    return cache
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Shared primality module for the seed prime scripts
+Segmented bytearray sieve with O(1) is_prime lookups, primes_in(lo, hi)
+iteration and pi(n) counting.
+
+The table grows on demand: the first lookup past its end sieves the next
+stretch segment by segment, so callers never need to size it up front.
+With an on-disk cache attached (see prime_cache), lookups the table cannot
+cover (past TABLE_LIMIT, or past a fixed shared table) are served from its
+memory map instead of being sieved again.
+
+Author: Ian Shannon-Garvey
+"""
+
+import threading
+from math import isqrt
+from multiprocessing import shared_memory
+
+from metrics import METRICS
+
+# Numbers per sieve segment (keeps the working bytearray cache-sized)
+SEGMENT_SIZE = 1 << 18
+
+# Largest value the in-memory table grows to automatically; above this
+# is_prime falls back to a deterministic Miller-Rabin test
+TABLE_LIMIT = 1 << 27
+
+# Miller-Rabin with these bases is exact for every n below MILLER_RABIN_LIMIT
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+MILLER_RABIN_LIMIT = 3317044064679887385961981
+
+def _small_sieve(limit):
+    """Plain sieve of Eratosthenes: flags[n] == 1 iff n is prime, 0 <= n <= limit"""
+    flags = bytearray(b'\x01') * (limit + 1)
+    flags[0:2] = b'\x00\x00'
+    for p in range(2, isqrt(limit) + 1):
+        if flags[p]:
+            flags[p * p::p] = bytes(len(range(p * p, limit + 1, p)))
+    return flags
+
+# flags[n] == 1 iff n is prime, for 0 <= n < len(_flags)
+_flags = _small_sieve(1 << 16)
+
+# Shared memory block backing _flags after attach_table (the table is then fixed)
+_shared = None
+
+# PrimeCache serving lookups past the table after attach_cache
+_cache = None
+
+# Held while the table grows, so threads extending it at once cannot interleave
+_grow = threading.RLock()
+
+def _base_primes(limit):
+    """Yield the primes <= limit from the table (used to sieve segments)"""
+    flags = segment_flags(0, limit + 1)
+    p = flags.find(1)
+    while p != -1:
+        yield p
+        p = flags.find(1, p + 1)
+
+def sieve_segment(lo, hi):
+    """Sieve [lo, hi): returns a bytearray with flags[i] == 1 iff lo + i is prime"""
+    lo = max(lo, 0)
+    if hi <= lo:
+        return bytearray()
+    METRICS.count('numbers_sieved', hi - lo)
+    flags = bytearray(b'\x01') * (hi - lo)
+    for n in range(lo, min(hi, 2)):
+        flags[n - lo] = 0
+    for p in _base_primes(isqrt(hi - 1)):
+        start = max(p * p, (lo + p - 1) // p * p)
+        if start < hi:
+            flags[start - lo::p] = bytes(len(range(start, hi, p)))
+    return flags
+
+def ensure(limit):
+    """Extend the in-memory table so that it covers 0..limit"""
+    if limit < len(_flags) or _shared is not None:
+        return
+    with _grow:
+        size = len(_flags)
+        if limit < size:
+            return
+        # Grow geometrically so an ascending scan sieves each number once
+        target = max(limit + 1, min(2 * size, TABLE_LIMIT + 1))
+        while size < target:
+            hi = min(size + SEGMENT_SIZE, target)
+            _flags.extend(sieve_segment(size, hi))
+            size = hi
+
+def segment_flags(lo, hi):
+    """Prime flags for [lo, hi), served from the table where it reaches"""
+    lo = max(lo, 0)
+    if hi <= TABLE_LIMIT + 1:
+        ensure(hi - 1)
+    if hi <= len(_flags):
+        return bytearray(_flags[lo:hi])
+    if _cache is not None and hi <= _cache.limit + 1:
+        return _cache.segment_flags(lo, hi)
+    return sieve_segment(lo, hi)
+
+def is_prime(n):
+    """Check if n is prime"""
+    if n < 2:
+        return False
+    if n < len(_flags):
+        return _flags[n] == 1
+    if n <= TABLE_LIMIT and _shared is None:
+        ensure(n)
+        return _flags[n] == 1
+    if _cache is not None and n <= _cache.limit:
+        return _cache.is_prime(n)
+    if n < MILLER_RABIN_LIMIT:
+        return miller_rabin(n)
+    if n % 2 == 0:
+        return False
+    for p in primes_in(3, isqrt(n) + 1):
+        if n % p == 0:
+            return False
+    return True
+
+def miller_rabin(n):
+    """Check if n is prime; exact for n < MILLER_RABIN_LIMIT (covers all 64-bit n)"""
+    if n < 2:
+        return False
+    for p in MILLER_RABIN_BASES:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in MILLER_RABIN_BASES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+def primes_in(lo, hi):
+    """Iterate over the primes p with lo <= p < hi, one segment at a time"""
+    lo = max(lo, 2)
+    while lo < hi:
+        seg_hi = min(lo + SEGMENT_SIZE, hi)
+        flags = segment_flags(lo, seg_hi)
+        i = flags.find(1)
+        while i != -1:
+            yield lo + i
+            i = flags.find(1, i + 1)
+        lo = seg_hi
+
+def pi(n):
+    """Count the primes <= n"""
+    count = 0
+    lo = 0
+    while lo <= n:
+        hi = min(lo + SEGMENT_SIZE, n + 1)
+        count += segment_flags(lo, hi).count(1)
+        lo = hi
+    return count
+
+def share_table(limit):
+    """Copy the table for 0..limit into a new shared memory block
+
+    The caller owns the block and must close() and unlink() it when done.
+    """
+    ensure(limit)
+    shm = shared_memory.SharedMemory(create=True, size=limit + 1)
+    shm.buf[:limit + 1] = _flags[:limit + 1]
+    return shm
+
+def attach_table(name, size):
+    """Serve lookups from a block made by share_table instead of a local table
+
+    Meant for worker processes: the shared table is read-only and fixed, and
+    anything past its end is sieved segment by segment as usual.
+    """
+    global _flags, _shared
+    _shared = shared_memory.SharedMemory(name=name)
+    _flags = _shared.buf[:size].toreadonly()
+
+def attach_cache(cache):
+    """Serve lookups the in-memory table cannot cover from a prime_cache.PrimeCache"""
+    global _cache
+    _cache = cache
+
+def attached_cache():
+    """The PrimeCache given to attach_cache, or None"""
+    return _cache
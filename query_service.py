@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Local query service for seed, witness and generation lookups
+Answers "is n a seed", "first witness for p" and "generation depth and
+parents of p" over HTTP/JSON from a precomputed index loaded at startup.
+Indexed queries are array lookups answered on the event loop; anything past
+the index is computed on demand in a worker thread, behind a bounded LRU
+cache, so it never holds up indexed queries.
+
+Usage:
+    python3 query_service.py build seed_index.bin 10000000
+    python3 query_service.py serve seed_index.bin --port 8765
+
+    curl 'http://127.0.0.1:8765/seed?n=167'
+    curl 'http://127.0.0.1:8765/witness?p=1000003'
+    curl 'http://127.0.0.1:8765/generation?p=997'
+
+Author: Ian Shannon-Garvey
+"""
+
+import argparse
+import asyncio
+import json
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import parse_qs, urlsplit
+
+from checkpoint_journal import _atomic_write
+from generation_engine import SEEDS, GenerationStore
+from prime_sieve import MILLER_RABIN_LIMIT, is_prime
+from seed_search import first_witness, minimal_witnesses
+
+MAGIC = b'SEEDIDX\x00'
+VERSION = 1
+
+# magic, version, limit, number of primes
+_HEADER = struct.Struct('<8sH6xQQ')
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Entries kept by each on-demand LRU cache
+LRU_SIZE = 4096
+
+# Largest p whose generation is computed on demand past the index
+GENERATION_ON_DEMAND_LIMIT = 10**7
+
+# On-demand stores kept; each covers p up to the next power of two (capped at
+# GENERATION_ON_DEMAND_LIMIT), so one build serves every p below it
+STORE_CACHE = 2
+
+# On-demand work runs here, one query at a time, so concurrent queries for
+# the same range never build its store twice; indexed queries never touch
+# the prime table
+_ON_DEMAND = ThreadPoolExecutor(max_workers=1)
+
+# Longest request head accepted, in bytes
+MAX_REQUEST = 8192
+
+class SeedIndex:
+    """Seeds, first witnesses and generation info of every prime up to a limit
+
+    Arrays are keyed by prime index as in GenerationStore; witness[i] is the
+    smallest witness a of primes[i], or 0 for a seed.
+    """
+
+    def __init__(self, limit, store, witness):
+        self.limit = limit
+        self.store = store
+        self.witness = witness
+
+    @classmethod
+    def build(cls, limit):
+        """Compute the index up to limit"""
+        store = GenerationStore.build(SEEDS, limit)
+        minimal = minimal_witnesses(2, limit + 1)
+        witness = array('I', (minimal.get(p, 0) for p in store.primes))
+        return cls(limit, store, witness)
+
+    def save(self, path):
+        store = self.store
+        data = (_HEADER.pack(MAGIC, VERSION, self.limit, len(store))
+                + store.primes.tobytes() + store.depth.tobytes()
+                + store.parent_p.tobytes() + store.parent_q.tobytes()
+                + self.witness.tobytes())
+        _atomic_write(path, data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != MAGIC:
+                raise ValueError(f"{path} is not a seed index")
+            _, version, limit, count = _HEADER.unpack(header)
+            if version != VERSION:
+                raise ValueError(f"{path} has index version {version}, expected {VERSION}")
+            arrays = []
+            for code in 'QBiiI':
+                values = array(code)
+                values.fromfile(f, count)
+                arrays.append(values)
+        primes, depth, parent_p, parent_q, witness = arrays
+        return cls(limit, GenerationStore(primes, depth, parent_p, parent_q), witness)
+
+    def _index(self, p):
+        """Prime index of p, or None if p is not a prime"""
+        i = bisect_left(self.store.primes, p)
+        if i < len(self.store) and self.store.primes[i] == p:
+            return i
+        return None
+
+    def indexed(self, n):
+        """Whether queries about n are answered from the index alone"""
+        return n <= self.limit
+
+    def seed(self, n):
+        if n > self.limit:
+            return _seed_on_demand(n)
+        i = self._index(n)
+        return i is not None and self.witness[i] == 0
+
+    def first_witness(self, p):
+        """(a, b) with the smallest witness a of prime p, or None for seeds and non-primes"""
+        if p > self.limit:
+            return _witness_on_demand(p)
+        i = self._index(p)
+        if i is None or self.witness[i] == 0:
+            return None
+        a = self.witness[i]
+        return a, (p - a) // 2
+
+    def generation(self, p):
+        """{'prime', 'generation', 'parents'} for prime p, or None if p is not prime"""
+        store = self.store
+        if p <= self.limit:
+            if self._index(p) is None:
+                return None
+        else:
+            if p > GENERATION_ON_DEMAND_LIMIT:
+                raise ValueError(f"generation is only computed up to {GENERATION_ON_DEMAND_LIMIT:,}")
+            if not is_prime(p):
+                return None
+            store = _store_on_demand(min(1 << (p - 1).bit_length(), GENERATION_ON_DEMAND_LIMIT))
+        return {'prime': p, 'generation': store.generation(p), 'parents': store.parents(p)}
+
+@lru_cache(maxsize=LRU_SIZE)
+def _seed_on_demand(n):
+    return is_prime(n) and first_witness(n) is None
+
+@lru_cache(maxsize=LRU_SIZE)
+def _witness_on_demand(p):
+    a = first_witness(p) if is_prime(p) else None
+    return None if a is None else (a, (p - a) // 2)
+
+@lru_cache(maxsize=STORE_CACHE)
+def _store_on_demand(limit):
+    return GenerationStore.build(SEEDS, limit)
+
+def _int_param(query, name):
+    values = query.get(name)
+    if not values:
+        raise ValueError(f"missing parameter {name}")
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ValueError(f"parameter {name} must be an integer") from None
+    if value >= MILLER_RABIN_LIMIT:
+        raise ValueError(f"parameter {name} must be below {MILLER_RABIN_LIMIT:,}")
+    return value
+
+# Parameter each path is about
+_PARAMS = {'/seed': 'n', '/witness': 'p', '/generation': 'p'}
+
+def on_demand(index, path, query):
+    """Whether answering the request needs work past the index"""
+    try:
+        return path in _PARAMS and not index.indexed(_int_param(query, _PARAMS[path]))
+    except ValueError:
+        return False
+
+def answer(index, path, query):
+    """(status, JSON-able body) for one request"""
+    try:
+        if path == '/seed':
+            n = _int_param(query, 'n')
+            return 200, {'n': n, 'seed': index.seed(n)}
+        if path == '/witness':
+            p = _int_param(query, 'p')
+            pair = index.first_witness(p)
+            return 200, {'p': p, 'witness': pair and {'a': pair[0], 'b': pair[1]}}
+        if path == '/generation':
+            p = _int_param(query, 'p')
+            info = index.generation(p)
+            if info is None:
+                return 404, {'error': f"{p} is not prime"}
+            return 200, info
+        if path == '/health':
+            return 200, {'limit': index.limit, 'primes': len(index.store)}
+    except ValueError as error:
+        return 400, {'error': str(error)}
+    return 404, {'error': f"unknown path {path}"}
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+
+async def _handle(index, reader, writer):
+    """Serve HTTP/1.1 requests on one connection until the client closes it"""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                break
+            lines = head.decode('latin-1').split('\r\n')
+            parts = lines[0].split()
+            if len(parts) != 3 or parts[0] != 'GET':
+                status, body = 400, {'error': "only GET is supported"}
+                keep_alive = False
+            else:
+                url = urlsplit(parts[1])
+                query = parse_qs(url.query)
+                if on_demand(index, url.path, query):
+                    status, body = await asyncio.get_running_loop().run_in_executor(
+                        _ON_DEMAND, answer, index, url.path, query)
+                else:
+                    status, body = answer(index, url.path, query)
+                headers = {k.strip().lower(): v.strip() for k, _, v in
+                           (line.partition(':') for line in lines[1:] if line)}
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and parts[2] == 'HTTP/1.1')
+            payload = json.dumps(body).encode()
+            writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                         .encode() + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+async def serve(index, host=HOST, port=PORT):
+    """Serve index until cancelled"""
+    server = await asyncio.start_server(lambda r, w: _handle(index, r, w), host, port,
+                                        limit=MAX_REQUEST)
+    print(f"Serving seed index up to {index.limit:,} on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="precompute an index")
+    build.add_argument('index', help="index file to write")
+    build.add_argument('limit', type=int, help="index every prime up to this value")
+    run = commands.add_parser('serve', help="serve an index")
+    run.add_argument('index', help="index file to load")
+    run.add_argument('--host', default=HOST)
+    run.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        SeedIndex.build(args.limit).save(args.index)
+        print(f"Index up to {args.limit:,} written to {args.index}")
+        return 0
+    try:
+        asyncio.run(serve(SeedIndex.load(args.index), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
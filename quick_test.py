@@ -1,13 +1,7 @@
 #!/usr/bin/env python3
 """Quick test of the seed prime scripts"""
 
-def is_prime(n):
-    if n < 2:
-        return False
-    for i in range(2, int(n**0.5) + 1):
-        if n % i == 0:
-            return False
-    return True
+from prime_sieve import is_prime
 
 def is_seed_prime(n):
     if not is_prime(n):
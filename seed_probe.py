@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Point queries of the seed property for huge primes
+Past the sieve range the seed property of a single prime p can still be
+settled quickly in practice: try the small primes a in order, and check
+b = (p - a) / 2 with a deterministic Miller-Rabin test. The first prime b
+is a witness, proven correct since the test is exact below 3.3 * 10^24.
+Only a prime with no witness among the first PROBE_TRIES primes a is left
+undecided, unless the tries cover every a < p / 3, which proves it a seed.
+
+Usage:
+    python3 seed_probe.py                 # spot-check random primes near 10^12 .. 10^18
+    python3 seed_probe.py 1000000000039   # probe given primes
+
+Author: Ian Shannon-Garvey
+"""
+
+import random
+import sys
+import time
+from collections import namedtuple
+from itertools import islice
+from math import gcd, prod
+
+from prime_sieve import MILLER_RABIN_LIMIT, miller_rabin, primes_in
+
+# Small primes a tried before a prime is reported undecided
+PROBE_TRIES = 10000
+
+# Odd primes whose product screens b before the Miller-Rabin test
+_SCREEN = prod(primes_in(3, 200))
+
+# Spot-check defaults: random primes per decade and the decades 10^12 .. 10^18
+SPOT_CHECKS = 1000
+SPOT_DECADES = range(12, 19)
+
+# status is 'witness' (a, b set), 'seed' (proven) or 'undecided' (tries ran out)
+Probe = namedtuple('Probe', 'p status a b tried')
+
+_SMALL = list(islice(primes_in(2, 1 << 20), PROBE_TRIES))
+
+def _small_primes(count):
+    """The first count primes"""
+    if count <= len(_SMALL):
+        return _SMALL[:count]
+    return list(islice(primes_in(2, 1 << 62), count))
+
+def probe_seed(p, tries=PROBE_TRIES, small=None):
+    """Probe prime p for a witness p = a + 2b, trying the first tries primes a"""
+    if p >= MILLER_RABIN_LIMIT:
+        raise ValueError(f"{p} is beyond the deterministic Miller-Rabin range")
+    if not miller_rabin(p):
+        raise ValueError(f"{p} is not prime")
+    small = small if small is not None else _small_primes(tries)
+    tried = 0
+    for a in small:
+        if 3 * a >= p:
+            # Every a < p / 3 has been tried: no representation exists
+            return Probe(p, 'seed', None, None, tried)
+        tried += 1
+        b, odd = divmod(p - a, 2)
+        if odd:
+            continue
+        # b shares no factor with the screen, or b is one of its primes
+        if (gcd(b, _SCREEN) == 1 or b < 200) and miller_rabin(b):
+            return Probe(p, 'witness', a, b, tried)
+    if small and 3 * (small[-1] + 1) >= p:
+        return Probe(p, 'seed', None, None, tried)
+    return Probe(p, 'undecided', None, None, tried)
+
+def probe_batch(primes, tries=PROBE_TRIES):
+    """probe_seed for each prime, sharing one table of small primes"""
+    small = _small_primes(tries)
+    return [probe_seed(p, tries, small) for p in primes]
+
+def random_prime(lo, hi, rng=random):
+    """A uniformly chosen odd integer in [lo, hi) stepped up to the next prime"""
+    n = rng.randrange(lo, hi) | 1
+    while not miller_rabin(n):
+        n += 2
+    return n
+
+def main():
+    if len(sys.argv) > 1:
+        for result in probe_batch(int(arg) for arg in sys.argv[1:]):
+            if result.status == 'witness':
+                print(f"{result.p} = {result.a} + 2×{result.b} (after {result.tried} tries)")
+            else:
+                print(f"{result.p}: {result.status} after {result.tried} tries")
+        return 0
+
+    print("Seed property spot checks for large primes")
+    print("=" * 60)
+    rng = random.Random(0)
+    undecided = []
+    for decade in SPOT_DECADES:
+        primes = [random_prime(10**decade, 10**(decade + 1), rng) for _ in range(SPOT_CHECKS)]
+        start = time.perf_counter()
+        results = probe_batch(primes)
+        elapsed = time.perf_counter() - start
+        witnesses = sum(r.status == 'witness' for r in results)
+        deepest = max(results, key=lambda r: r.tried)
+        undecided.extend(r.p for r in results if r.status != 'witness')
+        print(f"10^{decade}: {witnesses}/{len(results)} witnessed, "
+              f"{len(results) / elapsed:,.0f} primes/s, deepest {deepest.tried} tries "
+              f"({deepest.p})")
+    if undecided:
+        print(f"\n⚠ Without a witness: {undecided}")
+        return 1
+    print("\nEvery probed prime has a witness, so none is a seed prime.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
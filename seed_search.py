@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Batched seed prime search
+Computes r(n) = #{a < b prime : a + 2b = n} for a whole block of n in one pass;
+seed primes are the primes with r(n) = 0. The counts come from a product of
+the prime indicator with its dilated copy, packed into big decimals so that
+libmpdec's fast multiplication does the convolution. Pairs are split by value
+range in halves to keep a < b exact. Every function takes the coefficient k
+of b as a parameter (default 2) for the generalisation n = a + k·b.
+
+The segment search also records each prime's minimal witness a, summarised
+per segment as the largest one and the primes that set a new record.
+
+Author: Ian Shannon-Garvey
+"""
+
+import decimal
+from array import array
+from collections import namedtuple
+from itertools import islice
+
+from metrics import METRICS
+from prime_sieve import is_prime, pi, primes_in, segment_flags
+from segment_scheduler import cache_segment_size
+
+# Recorded with verified ranges; bump when the search or its summaries change
+ENGINE_VERSION = "prefilter-bulk/2"
+
+# Value ranges narrower than this are counted pair by pair
+DIRECT_WIDTH = 64
+
+# Number of small primes a the witness pre-filter tries before exact checks
+PREFILTER_PRIMES = 128
+
+# Numbers per search segment, sized for the L2 cache (see segment_scheduler)
+SEARCH_SEGMENT = cache_segment_size()
+
+# Numbers per survivor below which the remaining a are also filtered in bulk:
+# the bulk pass costs the same per a whatever the survivors, the exact search
+# costs the same per survivor, so the break-even scales with segment width
+BULK_DENSITY = 256
+
+# Search summary of one segment: number of primes, largest minimal witness a,
+# and the (p, a) whose minimal witness a exceeds that of every smaller prime
+# in the segment (records within the segment, ascending)
+SegmentSummary = namedtuple('SegmentSummary', 'lo hi primes max_witness records')
+
+# Exact context: packed products must never round
+_EXACT = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX,
+                         Emin=decimal.MIN_EMIN)
+
+_ASCII_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+def _pack(flags, stride, width):
+    """Pack 0/1 flags as a Decimal whose base 10**width digit i*stride is flags[i]"""
+    slots = (len(flags) - 1) * stride + 1
+    digits = bytearray(b'0') * (width * slots)
+    digits[width - 1::width * stride] = bytes(flags[::-1]).translate(_ASCII_DIGITS)
+    return _EXACT.create_decimal(digits.decode('ascii'))
+
+def _pack_counts(counts, width):
+    """Pack a list of small counts (lowest index least significant) as a Decimal"""
+    return _EXACT.create_decimal(''.join(f"{c:0{width}d}" for c in reversed(counts)))
+
+def _combine(parts, width):
+    """Add packed polynomials given as (poly, base) pairs; returns the sum and its base"""
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    base = min(b for _, b in parts)
+    total = decimal.Decimal(0)
+    for poly, b in parts:
+        total = _EXACT.add(total, _EXACT.scaleb(poly, width * (b - base)))
+    return total, base
+
+def _rectangle(a_lo, a_hi, b_lo, b_hi, lo, hi, width, k):
+    """Counts of a + kb in [lo, hi) for primes a in [a_lo, a_hi), b in [b_lo, b_hi)"""
+    a_lo = max(a_lo, lo - k * (b_hi - 1))
+    a_hi = min(a_hi, hi - k * b_lo)
+    if a_lo >= a_hi:
+        return None
+    b_lo = max(b_lo, (lo - a_hi + k) // k)
+    b_hi = min(b_hi, (hi - 1 - a_lo) // k + 1)
+    if b_lo >= b_hi:
+        return None
+    flags_a = segment_flags(a_lo, a_hi)
+    flags_b = segment_flags(b_lo, b_hi)
+    if 1 not in flags_a or 1 not in flags_b:
+        return None
+    product = _EXACT.multiply(_pack(flags_a, 1, width), _pack(flags_b, k, width))
+    return product, a_lo + k * b_lo
+
+def _direct(v_lo, v_hi, lo, hi, width, k):
+    """Counts of a + kb in [lo, hi) for primes a < b, both in [v_lo, v_hi), pair by pair"""
+    primes = list(primes_in(v_lo, v_hi))
+    sums = [a + k * b for j, b in enumerate(primes) for a in primes[:j]]
+    sums = [n for n in sums if lo <= n < hi]
+    if not sums:
+        return None
+    base = min(sums)
+    counts = [0] * (max(sums) - base + 1)
+    for n in sums:
+        counts[n - base] += 1
+    return _pack_counts(counts, width), base
+
+def _triangle(v_lo, v_hi, lo, hi, width, k):
+    """Counts of a + kb in [lo, hi) for primes a < b, both in [v_lo, v_hi)"""
+    if (k + 1) * v_lo >= hi or (k + 1) * v_hi <= lo:
+        return None
+    if v_hi - v_lo <= DIRECT_WIDTH:
+        return _direct(v_lo, v_hi, lo, hi, width, k)
+    mid = (v_lo + v_hi) // 2
+    return _combine([_triangle(v_lo, mid, lo, hi, width, k),
+                     _triangle(mid, v_hi, lo, hi, width, k),
+                     _rectangle(v_lo, mid, mid, v_hi, lo, hi, width, k)], width)
+
+def representation_counts(lo, hi, k=2):
+    """Return array r with r[n - lo] = #{a < b prime : a + kb = n} for lo <= n < hi
+
+    Best used on blocks that start near 0: the product for a block costs
+    about as much as one covering [0, hi).
+    """
+    lo = max(lo, 0)
+    if hi <= lo:
+        return array('I')
+    b_max = (hi - 1) // k
+    # No coefficient can exceed the number of candidate b values
+    width = len(str(pi(b_max)))
+    result = _triangle(2, b_max + 1, lo, hi, width, k)
+    if result is None:
+        return array('I', bytes(4 * (hi - lo)))
+    poly, base = result
+    # Coefficient j of poly is n = base + j; keep exactly the digits for [lo, hi)
+    text = format(poly, 'f')
+    if base > lo:
+        text += '0' * (width * (base - lo))
+        base = lo
+    need = width * (hi - base)
+    text = text[-need:].rjust(need, '0')[:need - width * (lo - base)]
+    counts = array('I', map(int, (text[i:i + width] for i in range(0, len(text), width))))
+    counts.reverse()
+    return counts
+
+def _bits(flags):
+    """Python int with bit i set iff flags[i] == 1"""
+    return int(bytes(flags[::-1]).translate(_ASCII_DIGITS) or b'0', 2)
+
+def _positions(bits):
+    """Indices of the set bits of a Python int, ascending"""
+    text = bin(bits)[:1:-1]
+    i = text.find('1')
+    while i != -1:
+        yield i
+        i = text.find('1', i + 1)
+
+def witness_prefilter(lo, hi, count=PREFILTER_PRIMES, k=2, candidates=None, cleared=None,
+                      minimal=None):
+    """Return the primes in [lo, hi) with no witness a + kb among the first count primes a
+
+    The segment's primes and the candidate b are held as Python int bitmaps,
+    so each a costs one shift and one mask over the whole segment. Callers
+    filtering the same segment for several k can pass its prime bitmap
+    (_bits of the segment's flags) as candidates. If cleared is a dict, it
+    gets cleared[a] = the smallest prime whose minimal witness is a; if
+    minimal is a dict, it gets minimal[p] = a for every prime p cleared.
+    """
+    lo = max(lo, 0)
+    if hi <= lo:
+        return []
+    # For odd k only a = 2 can be a witness (see _witness_limit)
+    small = list(islice(primes_in(2, hi), 1 if k % 2 else count))
+    if candidates is None:
+        candidates = _bits(segment_flags(lo, hi))
+    remaining = candidates.bit_count()
+    if small and candidates:
+        # Every b with a + kb in [lo, hi) for some a in small, dilated so bit kj is b_lo + j
+        b_lo = max((lo - small[-1]) // k, 0)
+        b_hi = max((hi - 3) // k + 1, b_lo)
+        flags_b = segment_flags(b_lo, b_hi)
+        dilated = bytearray(max(k * len(flags_b) - k + 1, 0))
+        dilated[::k] = flags_b
+        b_bits = _bits(dilated)
+        for depth, a in enumerate(small, 1):
+            witnesses = b_bits
+            if a >= b_lo:
+                # Only b > a gives a valid representation
+                cut = k * (a - b_lo) + 1
+                witnesses = witnesses >> cut << cut
+            shift = a + k * b_lo - lo
+            witnesses = witnesses << shift if shift >= 0 else witnesses >> -shift
+            if cleared is not None:
+                hit = candidates & witnesses
+                if hit:
+                    cleared[a] = lo + (hit & -hit).bit_length() - 1
+            if minimal is not None:
+                for i in _positions(candidates & witnesses):
+                    minimal[lo + i] = a
+            candidates &= ~witnesses
+            # Primes cleared by the depth-th a have their witness at that depth
+            left = candidates.bit_count()
+            METRICS.depth(depth, remaining - left)
+            remaining = left
+            if not candidates:
+                break
+    return [lo + i for i in _positions(candidates)]
+
+def _witness_limit(n, k):
+    """Bound on the witnesses a of n = a + kb (a < b): a < n / (k + 1)
+
+    For odd k and odd n, a + kb is odd only with a = 2.
+    """
+    return min(n // (k + 1) + 1, 3) if k % 2 else n // (k + 1) + 1
+
+def _witness_search(n, start, k=2):
+    """(first_witness(n, start, k), number of a tried)"""
+    tried = tests = 0
+    found = None
+    for a in primes_in(start, _witness_limit(n, k)):
+        tried += 1
+        b, rem = divmod(n - a, k)
+        if not rem and b > a:
+            tests += 1
+            if is_prime(b):
+                found = a
+                break
+    METRICS.count('primality_tests', tests)
+    return found, tried
+
+def first_witness(n, start=2, k=2):
+    """Smallest prime a >= start with n = a + kb for a prime b > a, or None"""
+    return _witness_search(n, start, k)[0]
+
+def iter_witnesses(n, k=2):
+    """Yield the pairs (a, b), a < b prime with n = a + kb, in increasing a
+
+    Lazy: the first pair is returned as soon as it is found.
+    """
+    for a in primes_in(2, _witness_limit(n, k)):
+        b, rem = divmod(n - a, k)
+        if not rem and b > a and is_prime(b):
+            yield a, b
+
+def _records(cleared):
+    """Records (p, a) ascending, from {a: smallest prime with minimal witness a}
+
+    p is a record iff every smaller prime has a smaller minimal witness,
+    i.e. p is below the smallest prime of every larger witness.
+    """
+    records = []
+    below = None
+    for a in sorted(cleared, reverse=True):
+        p = cleared[a]
+        if below is None or p < below:
+            records.append((p, a))
+            below = p
+    records.reverse()
+    return records
+
+def segment_search(lo, hi, k=2, candidates=None):
+    """Return (seed primes in [lo, hi), SegmentSummary) for coefficient k
+
+    The witness pre-filter removes almost every prime in bulk. A few
+    survivors get an exact witness search each; when many survive (large
+    even k, where seeds are common) the pre-filter carries on with every
+    a < hi / (k + 1) instead, which is exact and cheaper than scanning all
+    those a for each survivor. Either way the smallest prime cleared by
+    each a is noted, which is all the witness records need.
+    """
+    # Offsets below are taken from lo, so it must not be clamped later on;
+    # candidates built from an earlier lo would be off, so they are rebuilt
+    if lo < 2:
+        lo, candidates = 2, None
+    if candidates is None:
+        candidates = _bits(segment_flags(lo, hi))
+    count = candidates.bit_count()
+    METRICS.count('primes_searched', count)
+    METRICS.count('segments')
+    cleared = {}
+    survivors = witness_prefilter(lo, hi, k=k, candidates=candidates, cleared=cleared)
+    if len(survivors) * BULK_DENSITY > hi - lo:
+        bits = 0
+        for p in survivors:
+            bits |= 1 << (p - lo)
+        seeds = witness_prefilter(lo, hi, pi((hi - 1) // (k + 1)), k, bits, cleared)
+    else:
+        seeds = []
+        small = list(islice(primes_in(2, max(hi, 3)), PREFILTER_PRIMES))
+        for p in survivors:
+            a, tried = _witness_search(p, small[-1] + 1, k)
+            if a is None:
+                seeds.append(p)
+            else:
+                METRICS.depth(len(small) + tried)
+                cleared[a] = min(cleared.get(a, p), p)
+    summary = SegmentSummary(lo, hi, count, max(cleared, default=0), _records(cleared))
+    return seeds, summary
+
+def minimal_witnesses(lo, hi, k=2):
+    """Return {p: smallest witness a} for every non-seed prime p in [lo, hi)
+
+    Seeds are left out. Uses the pre-filter and exact search as segment_search does.
+    """
+    lo = max(lo, 2)
+    minimal = {}
+    survivors = witness_prefilter(lo, hi, k=k, minimal=minimal)
+    if len(survivors) * BULK_DENSITY > hi - lo:
+        bits = 0
+        for p in survivors:
+            bits |= 1 << (p - lo)
+        witness_prefilter(lo, hi, pi((hi - 1) // (k + 1)), k, bits, minimal=minimal)
+    else:
+        small = list(islice(primes_in(2, max(hi, 3)), PREFILTER_PRIMES))
+        for p in survivors:
+            a = first_witness(p, small[-1] + 1, k)
+            if a is not None:
+                minimal[p] = a
+    return minimal
+
+def segment_seed_primes(lo, hi, k=2, candidates=None):
+    """Return the seed primes in [lo, hi) for coefficient k (see segment_search)"""
+    return segment_search(lo, hi, k, candidates)[0]
+
+def search_with_summaries(lo, hi, k=2, segment=SEARCH_SEGMENT):
+    """Return (seed primes in [lo, hi), SegmentSummary per segment of width segment)"""
+    lo = max(lo, 2)
+    seeds = []
+    summaries = []
+    while lo < hi:
+        seg_hi = min(lo + segment, hi)
+        found, summary = segment_search(lo, seg_hi, k)
+        seeds.extend(found)
+        summaries.append(summary)
+        lo = seg_hi
+    return seeds, summaries
+
+def merge_records(summaries, records=None):
+    """Extend the global witness records (p, a) with segment summaries in ascending order
+
+    A segment's own record is a global record iff its witness beats every
+    earlier one. Returns the extended list.
+    """
+    records = list(records or [])
+    best = records[-1][1] if records else 0
+    for summary in sorted(summaries):
+        for p, a in summary.records:
+            if a > best:
+                records.append((p, a))
+                best = a
+    return records
+
+def iter_seed_primes(start, stop, k=2):
+    """Yield the seed primes p with start <= p < stop (for coefficient k), in order
+
+    The range is walked one segment at a time (see segment_seed_primes), so
+    memory stays bounded by a segment however long the range.
+    """
+    lo = max(start, 2)
+    while lo < stop:
+        seg_hi = min(lo + SEARCH_SEGMENT, stop)
+        yield from segment_seed_primes(lo, seg_hi, k)
+        lo = seg_hi
+
+def seed_primes_in(lo, hi, k=2):
+    """Return the seed primes p with lo <= p < hi (see iter_seed_primes)"""
+    return list(iter_seed_primes(lo, hi, k))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Cache-aware adaptive scheduling of search work
+Segments are sized so that a segment's flags, dilated b flags and bitmaps
+stay in the L2 cache, which is read from sysfs where available. Work units
+(a run of segments handed to one worker, or one checkpoint block) are sized
+from the measured cost per number, fitted as a power law of n since the
+cost grows along the range, so each unit takes about a target time. Near
+the end of a range units shrink so that every worker finishes at about the
+same time: idle workers take the next unit from the shared queue, and no
+worker is left holding a long one.
+
+Usage:
+    python3 segment_scheduler.py      # show the cache size and segment width chosen here
+
+Author: Ian Shannon-Garvey
+"""
+
+import glob
+import os
+
+from metrics import CostCurve
+
+# L2 size assumed when sysfs does not report one
+L2_FALLBACK = 1 << 20
+
+# Bytes of working set per number of a segment in segment_search (flags,
+# dilated b flags, the copies _bits makes and the int bitmaps), measured
+BYTES_PER_NUMBER = 16
+
+# Bounds on the segment width
+MIN_SEGMENT = 1 << 14
+MAX_SEGMENT = 1 << 20
+
+# Segments in the first unit, before anything has been measured
+INITIAL_SEGMENTS = 4
+
+# A unit is at most this many times the previous one, so early noisy
+# measurements cannot produce one huge unit
+MAX_GROWTH = 4
+
+# Units per worker left at the end of a range; units shrink to keep this many
+TAIL_UNITS = 2
+
+def l2_cache_bytes():
+    """Size of the L2 (data or unified) cache of cpu0, or L2_FALLBACK"""
+    for index in sorted(glob.glob('/sys/devices/system/cpu/cpu0/cache/index*')):
+        try:
+            with open(os.path.join(index, 'level')) as f:
+                level = f.read().strip()
+            with open(os.path.join(index, 'type')) as f:
+                kind = f.read().strip()
+            with open(os.path.join(index, 'size')) as f:
+                size = f.read().strip()
+        except OSError:
+            continue
+        if level == '2' and kind in ('Data', 'Unified'):
+            scale = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}.get(size[-1:].upper(), 1)
+            try:
+                return int(size.rstrip('KMGkmg')) * scale
+            except ValueError:
+                continue
+    return L2_FALLBACK
+
+def cache_segment_size(cache_bytes=None):
+    """Largest power-of-two segment width whose working set fits in the L2 cache"""
+    cache_bytes = cache_bytes or l2_cache_bytes()
+    width = MIN_SEGMENT
+    while width * 2 <= MAX_SEGMENT and width * 2 * BYTES_PER_NUMBER <= cache_bytes:
+        width *= 2
+    return width
+
+class AdaptiveScheduler:
+    """Hands out work units covering the (lo, hi) intervals, in order
+
+    Each unit is a whole number of segments, sized so that it should take
+    about target seconds at the throughput measured so far (report each
+    finished unit with record). With workers > 1, units near the end are
+    cut so that TAIL_UNITS units per worker remain. A target of 0 gives
+    fixed units of one segment each.
+    """
+
+    def __init__(self, intervals, target, workers=1, segment=None):
+        self.pending = [(lo, hi) for lo, hi in intervals if hi > lo]
+        self.target = target
+        self.workers = workers
+        self.segment = segment or cache_segment_size()
+        self.curve = CostCurve()
+        self.last_size = 0
+
+    def remaining(self):
+        """Intervals not yet handed out"""
+        return list(self.pending)
+
+    def unit_size(self):
+        """Width of the next unit"""
+        if not self.target:
+            return self.segment
+        lo = self.pending[0][0]
+        fitted = self.curve.fit()
+        if fitted is None:
+            size = INITIAL_SEGMENTS * self.segment
+        else:
+            c, k = fitted
+            size = int(self.target / (c * max(lo, 1) ** k))
+            size = min(size, MAX_GROWTH * self.last_size)
+        if self.workers > 1:
+            left = sum(hi - lo for lo, hi in self.pending)
+            size = min(size, left // (TAIL_UNITS * self.workers))
+        return max(size // self.segment, 1) * self.segment
+
+    def next_unit(self):
+        """(lo, hi) of the next unit, or None when everything has been handed out"""
+        if not self.pending:
+            return None
+        lo, hi = self.pending[0]
+        size = self.unit_size()
+        self.last_size = size
+        unit_hi = min(lo + size, hi)
+        if unit_hi == hi:
+            self.pending.pop(0)
+        else:
+            self.pending[0] = (unit_hi, hi)
+        return lo, unit_hi
+
+    def record(self, lo, hi, seconds):
+        """Report that the unit [lo, hi) took seconds"""
+        self.curve.add(lo, hi, seconds)
+
+    def __iter__(self):
+        unit = self.next_unit()
+        while unit is not None:
+            yield unit
+            unit = self.next_unit()
+
+def main():
+    cache = l2_cache_bytes()
+    print(f"L2 cache: {cache // 1024:,} KiB, CPUs: {os.cpu_count()}")
+    print(f"Segment width: {cache_segment_size(cache):,} numbers "
+          f"({BYTES_PER_NUMBER} bytes of working set per number)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Permanent ledger of verified ranges
+One JSON line per verified interval, with the seeds found in it, the search
+engine version and a content hash of the segment results (seeds and minimal
+witness summaries). Unlike the checkpoint journal it is never deleted, so a
+run to a larger limit only searches what earlier runs did not cover, and any
+stored interval can be re-audited by searching it again and comparing hashes.
+
+Usage:
+    python3 verified_ledger.py [ledger] [--audit N]
+
+Author: Ian Shannon-Garvey
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+from checkpoint_journal import _atomic_write, merge_intervals, subtract_intervals
+from seed_search import ENGINE_VERSION, merge_records, search_with_summaries
+
+LEDGER_FILE = "seed_primes_ledger.jsonl"
+
+# Intervals re-searched by a default audit
+AUDIT_SAMPLE = 3
+
+def results_digest(lo, hi, seeds, summaries):
+    """SHA-256 of the results for [lo, hi): its seeds, prime count and witness records
+
+    The segment summaries are merged first, so the digest does not depend on
+    how the interval was cut into segments or shards.
+    """
+    digest = hashlib.sha256(f"{lo} {hi}\n".encode())
+    digest.update(json.dumps(sorted(seeds)).encode())
+    digest.update(json.dumps([sum(s.primes for s in summaries),
+                              max((s.max_witness for s in summaries), default=0),
+                              merge_records(summaries)]).encode())
+    return digest.hexdigest()
+
+class VerifiedLedger:
+    """Append-only record of verified intervals, loaded whole at startup"""
+
+    def __init__(self, path=LEDGER_FILE):
+        self.path = path
+        self.entries = []
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        """Read every complete line; drop a torn tail left by a crash"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                break
+            self.entries.append(entry)
+            offset += len(line)
+        if offset < len(data):
+            print(f"Ledger {self.path}: dropping {len(data) - offset} bytes of incomplete entry")
+            _atomic_write(self.path, data[:offset])
+
+    def record(self, lo, hi, seeds, summaries):
+        """Durably record that [lo, hi) is verified with these results"""
+        entry = {
+            'lo': lo,
+            'hi': hi,
+            'seeds': sorted(seeds),
+            'engine': ENGINE_VERSION,
+            'digest': results_digest(lo, hi, seeds, summaries),
+            'time': time.time(),
+        }
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.append(entry)
+
+    def covered(self):
+        """Sorted disjoint intervals verified so far"""
+        return merge_intervals((e['lo'], e['hi']) for e in self.entries)
+
+    def pending(self, lo, hi):
+        """Sub-ranges of [lo, hi) not yet verified"""
+        return subtract_intervals(lo, hi, self.covered())
+
+    def seeds(self, lo, hi):
+        """Sorted seeds recorded in [lo, hi)"""
+        return sorted({p for e in self.entries for p in e['seeds'] if lo <= p < hi})
+
+    def audit(self, sample=AUDIT_SAMPLE, rng=random):
+        """Re-search a random sample of entries; returns the entries whose results differ
+
+        Digests are compared for entries from this engine version; entries
+        from other versions have only their seeds compared.
+        """
+        mismatched = []
+        for entry in rng.sample(self.entries, min(sample, len(self.entries))):
+            seeds, summaries = search_with_summaries(entry['lo'], entry['hi'])
+            if entry['engine'] != ENGINE_VERSION:
+                if sorted(seeds) != entry['seeds']:
+                    mismatched.append(entry)
+            elif results_digest(entry['lo'], entry['hi'], seeds, summaries) != entry['digest']:
+                mismatched.append(entry)
+        return mismatched
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('ledger', nargs='?', default=LEDGER_FILE)
+    parser.add_argument('--audit', type=int, metavar='N', help="re-search N random entries")
+    args = parser.parse_args()
+
+    ledger = VerifiedLedger(args.ledger)
+    print(f"Ledger {args.ledger}: {len(ledger.entries)} entries")
+    for lo, hi in ledger.covered():
+        print(f"  verified [{lo:,}, {hi:,})")
+    engines = sorted({e['engine'] for e in ledger.entries})
+    print(f"  engines: {engines}")
+    print(f"  seeds: {ledger.seeds(0, float('inf'))}")
+    if args.audit:
+        start = time.perf_counter()
+        mismatched = ledger.audit(args.audit)
+        print(f"\nAudited {min(args.audit, len(ledger.entries))} entries "
+              f"in {time.perf_counter() - start:.1f} s")
+        for entry in mismatched:
+            print(f"  ⚠ [{entry['lo']:,}, {entry['hi']:,}) no longer matches its digest")
+        if mismatched:
+            return 1
+        print("  All audited entries match")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,56 +9,46 @@ Date: July 2025
 
 # ADJUST THIS VALUE TO CHANGE SEARCH RANGE
 SEARCH_LIMIT = 1000000   # Search for seed primes up to this value
+PRIME_CACHE = None       # Path of an on-disk prime bitmap to reuse across runs (see prime_cache.py)
 
-def is_prime(n):
-    """Check if n is prime"""
-    if n < 2:
-        return False
-    for i in range(2, int(n**0.5) + 1):
-        if n % i == 0:
-            return False
-    return True
+from prime_cache import use_cache
+from prime_sieve import is_prime, primes_in
+from seed_search import iter_witnesses, seed_primes_in
 
-def is_seed_prime(n):
-    """Check if prime n cannot be written as a + 2*b with a < b both prime"""
+def is_seed_prime(n, k=2):
+    """Check if prime n cannot be written as a + k*b with a < b both prime (k = 2: A385077)"""
     if not is_prime(n):
         return False
     
-    # Try all possible decompositions n = a + 2*b with a < b
-    for a in range(2, n//3 + 1):
-        if is_prime(a):
-            remainder = n - a
-            if remainder % 2 == 0:
-                b = remainder // 2
-                if b > a and is_prime(b):
-                    # Found a valid representation
-                    return False
+    # Try all possible decompositions n = a + k*b with a < b
+    for a in primes_in(2, n//(k + 1) + 1):
+        remainder = n - a
+        if remainder % k == 0:
+            b = remainder // k
+            if b > a and is_prime(b):
+                # Found a valid representation
+                return False
     return True
 
-def find_all_seed_primes(limit):
-    """Find all seed primes up to limit"""
-    seeds = []
-    for n in range(2, limit + 1):
-        if is_seed_prime(n):
-            seeds.append(n)
-    return seeds
+def find_all_seed_primes(limit, k=2):
+    """Find all seed primes up to limit (segmented search with the witness pre-filter, see seed_search)"""
+    return seed_primes_in(2, limit + 1, k)
 
-def verify_non_seed(prime):
-    """Show how a non-seed prime can be written as a + 2*b"""
-    representations = []
-    for a in range(2, prime//3 + 1):
-        if is_prime(a):
-            remainder = prime - a
-            if remainder % 2 == 0:
-                b = remainder // 2
-                if b > a and is_prime(b):
-                    representations.append((a, b))
-    return representations
+def verify_non_seed(prime, k=2):
+    """Show how a non-seed prime can be written as a + k*b
+
+    Lists every representation; use seed_search.iter_witnesses to take
+    only the first few lazily.
+    """
+    return list(iter_witnesses(prime, k))
 
 def main():
     print("OEIS A385077: Seed Primes Verification")
     print("=" * 50)
     
+    if PRIME_CACHE:
+        use_cache(PRIME_CACHE, SEARCH_LIMIT)
+    
     # Find seed primes up to SEARCH_LIMIT
     print(f"\nSearching for seed primes up to {SEARCH_LIMIT:,}...")
     seeds = find_all_seed_primes(SEARCH_LIMIT)